@@ -19,17 +19,20 @@ class BackendStack(core.Stack):
             'UserType',  # resolver return type
             'Query',  # Operation type, either 'Query' | 'Mutation'
             'users.graphql.queries.user',  # resolver function file reference
-            persist_model_connection='UserModel',  # which model class to use to keep the connection open
+            persist_model_connection=True,  # the connection is opened in the init phase and kept across invocations
         ),
         ResolverConfig(
             'login',
             'Login',
             'Mutation',
             'users.graphql.mutations.login',
-            persist_model_connection='User',
+            persist_model_connection=True,
         ),
         # The logout is not that frequent, so no need to keep an open DB connection
         ResolverConfig('logout', 'Logout', 'Mutation', 'users.graphql.mutations.logout'),
+        # Nested fields get a resolver on their parent type, batched so one invocation resolves many parents at once.
+        # The resolver receives the list of parent sources and returns one result per source
+        ResolverConfig('owner', 'UserType', 'PostType', 'users.graphql.resolvers.owner', batch_size=50),
 
         # Resolvers for REST endpoints
         ResolverConfig(
@@ -51,7 +54,7 @@ class BackendStack(core.Stack):
         functions_config = [
             # A runnable example, replace with your resolvers
             ResolverConfig('user', 'UserType', 'Query', 'users.graphql.queries.user',
-                           persist_model_connection='UserModel'),
+                           persist_model_connection=True),
         ]
 
         self.lambdas_stack = LambdasStack(self, with_env('lambdas-stack'), functions_config)
@@ -0,0 +1,36 @@
+"""Resolvers measured by the offline benchmark harness, `python -m src.backend.benchmarks --help`.
+
+Events are recorded AppSync or API Gateway events (e.g. from the resolver's logs), replayed in a loop. A list inside
+the events file is replayed as an AppSync BatchInvoke event.
+
+
+# Example of a Users app configuration
+
+benchmarks_config = [
+    BenchmarkConfig(
+        ResolverConfig('user', 'UserType', 'Query', 'users.graphql.queries.user',
+                       persist_model_connection=True),  # the same config as in `BackendStack`
+        'user.json',  # events file in `src/backend/benchmarks/fixtures`
+        django_fixtures=['users.json'],  # Django fixtures the events need in the database
+    ),
+    BenchmarkConfig(
+        ResolverConfig('uploadProfileImage', 'UploadProfileImageApi.post', 'POST',
+                       'users.views.upload_profile_image', rest_path='api/users/{user_id}/profile-image'),
+        'upload_profile_image.json',
+        iterations=100,
+    ),
+]
+"""
+
+from src.backend.dataclasses import BenchmarkConfig, ResolverConfig
+
+benchmarks_config = [
+    # The example App of `src/backend/benchmarks/example` (settings `example_library.settings`), replace with your
+    # resolvers
+    BenchmarkConfig(
+        ResolverConfig('books', 'BookType', 'Query', 'example_library.graphql.queries.books', is_list=True,
+                       persist_model_connection=True),
+        'books.json',
+        django_fixtures=['library.json'],
+    ),
+]
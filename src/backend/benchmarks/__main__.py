@@ -0,0 +1,54 @@
+import argparse
+import json
+import os
+import sys
+
+from src.backend.benchmarks import benchmarks_config
+from src.backend.benchmarks.runner import COLD_RUNS, BenchmarkRunner, compare
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(
+        prog='python -m src.backend.benchmarks',
+        description='Replays recorded events against the generated resolver handlers and reports their cold start, '
+                    'warm latency, allocations and query counts.',
+    )
+    parser.add_argument('--settings', default=os.environ.get('DJANGO_SETTINGS_MODULE', 'example_library.settings'),
+                        help='Settings of the App, its default database must be a local one (e.g. Postgres)')
+    parser.add_argument('--only', nargs='*', help='Names of the resolvers to benchmark, all by default')
+    parser.add_argument('--iterations', type=int, help='Warm invocations replayed per resolver')
+    parser.add_argument('--cold-runs', type=int, default=COLD_RUNS)
+    parser.add_argument('--keepdb', action='store_true', help='Keep the test database between runs')
+    parser.add_argument('--output', default='benchmark.json', help='Where the JSON report is written')
+    parser.add_argument('--baseline', help='A previous report, the run fails when a gated metric regressed from it')
+
+    return parser.parse_args()
+
+
+def main():
+    arguments = parse_arguments()
+
+    configs = [config for config in benchmarks_config if not arguments.only or config.resolver.name in arguments.only]
+    report = BenchmarkRunner(configs, arguments.settings, iterations=arguments.iterations,
+                             cold_runs=arguments.cold_runs, keepdb=arguments.keepdb).run()
+
+    if arguments.baseline:
+        with open(arguments.baseline) as baseline_file:
+            report['comparison'] = compare(report, json.load(baseline_file))
+
+    with open(arguments.output, 'w') as output_file:
+        json.dump(report, output_file, indent=2)
+
+    for comparison in report.get('comparison', []):
+        change = '' if comparison['change'] is None else f"{comparison['change']:+.1%}"
+        flag = 'REGRESSED' if comparison['regressed'] else ''
+        print(f"{comparison['metric']:<60} {comparison['baseline']:>12} {comparison['current']:>12} {change:>8} {flag}")
+
+    print(f'Report written to {arguments.output}')
+
+    if any(comparison['regressed'] for comparison in report.get('comparison', [])):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
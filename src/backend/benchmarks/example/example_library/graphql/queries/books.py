@@ -0,0 +1,10 @@
+from example_library.graphql.types import BookType  # noqa: F401, the handler's TYPENAME
+from example_library.models import Book
+
+
+def resolver(root, info, author_id=None):
+    books = Book.objects.order_by('pk')
+    if author_id is not None:
+        books = books.filter(author_id=author_id)
+
+    return books
@@ -0,0 +1,20 @@
+import graphene
+
+
+class AuthorType(graphene.ObjectType):
+    id = graphene.ID()
+    name = graphene.String()
+
+
+class ReviewType(graphene.ObjectType):
+    id = graphene.ID()
+    rating = graphene.Int()
+    text = graphene.String()
+
+
+class BookType(graphene.ObjectType):
+    id = graphene.ID()
+    title = graphene.String()
+    published_on = graphene.Date()
+    author = graphene.Field(AuthorType)
+    reviews = graphene.List(ReviewType)
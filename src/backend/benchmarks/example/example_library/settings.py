@@ -0,0 +1,32 @@
+"""Settings of the example App the benchmarks run against out of the box, on SQLite so it needs no server."""
+import os
+import tempfile
+
+SECRET_KEY = 'benchmarks'
+DEBUG = False
+ALLOWED_HOSTS = ['*']
+
+INSTALLED_APPS = [
+    'django.contrib.contenttypes',
+    'example_library',
+]
+
+MIDDLEWARE = []
+ROOT_URLCONF = 'example_library.urls'
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(tempfile.gettempdir(), 'example_library.sqlite3'),
+        'TEST': {
+            # A file, the benchmark workers are separate processes
+            'NAME': os.path.join(tempfile.gettempdir(), 'test_example_library.sqlite3'),
+        },
+    },
+}
+
+GRAPHENE = {
+    'MIDDLEWARE': [],
+}
+
+USE_TZ = True
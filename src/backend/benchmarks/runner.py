@@ -0,0 +1,202 @@
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+from datetime import datetime, timezone
+from time import perf_counter
+from typing import Dict, List, Optional
+
+from src.backend.dataclasses import BenchmarkConfig
+from src.backend.resources.handler import generate_handler
+
+ITERATIONS = 1000  # Warm invocations replayed per benchmark
+COLD_RUNS = 5  # Fresh interpreters started per benchmark to time the handler import
+SERIALIZER_ROWS = 10000
+TOLERANCE = 0.10  # Relative increase over the baseline that fails the run
+
+# Report metric -> (relative tolerance, absolute slack), lower is better for all of them
+GATES = {
+    'cold_start.import_ms.p50': (TOLERANCE, 5.0),
+    'warm.latency_ms.p50': (TOLERANCE, 0.1),
+    'warm.latency_ms.p99': (TOLERANCE, 0.5),
+    'warm.latency_drift': (TOLERANCE, 0.1),
+    'warm.queries_per_invocation': (0, 0),
+    'warm.peak_kib': (TOLERANCE, 16),
+    'warm.memory_growth_kib': (0, 64),
+    'warm.errors': (0, 0),
+    'serializers.current_ms': (TOLERANCE, 1.0),
+}
+
+
+class BenchmarkRunner:
+    """Builds the `resolver.py` of each benchmarked resolver as `LambdasStack` does and measures it locally.
+
+    Each measurement runs in a fresh interpreter (see `worker.py`) that only sees the built handler, the
+    `django_serverless` package and the App, against a test database created on the database of the App's settings.
+    """
+    current_dir = os.path.split(os.path.abspath(__file__))[0]
+    build_dir = os.path.join(current_dir, '..', '.build', 'benchmarks')
+    fixtures_dir = os.path.join(current_dir, 'fixtures')
+    packages_dir = os.path.join(current_dir, '..', 'resources', 'packages')
+    app_dir = os.path.join(current_dir, '..', '..')  # Where the App's projects live, as in `app.py`
+    example_dir = os.path.join(current_dir, 'example')  # The example App of the default `benchmarks_config`
+
+    worker_file = os.path.join(current_dir, 'worker.py')
+    settings_module = 'benchmark_settings'
+
+    def __init__(self,
+                 benchmarks_config: List[BenchmarkConfig],
+                 settings: str,
+                 iterations: Optional[int] = None,
+                 cold_runs: int = COLD_RUNS,
+                 keepdb: bool = False,
+                 ):
+        self.benchmarks_config = benchmarks_config
+        self.settings = settings
+        self.iterations = iterations
+        self.cold_runs = cold_runs
+        self.keepdb = keepdb
+
+    def run(self) -> Dict:
+        # `generate_handler` finds the resolvers' source files from here
+        for path in self.app_paths:
+            if path not in sys.path:
+                sys.path.append(path)
+
+        shutil.rmtree(self.build_dir, ignore_errors=True)
+        os.makedirs(self.build_dir)
+        shutil.copytree(os.path.join(self.packages_dir, 'django_serverless'),
+                        os.path.join(self.build_dir, 'django_serverless'))
+
+        database = self._run_worker('setup', self.build_dir, {
+            'django_fixtures': [fixture for config in self.benchmarks_config for fixture in config.django_fixtures],
+        }, settings=self.settings)
+        self._write_settings(database['test_database_name'])
+
+        try:
+            benchmarks = {config.resolver.name: self._run_benchmark(config) for config in self.benchmarks_config}
+            serializers = self._run_worker('serializers', self.build_dir, {'rows': SERIALIZER_ROWS, 'repeat': 5})
+        finally:
+            if not self.keepdb:
+                self._run_worker('teardown', self.build_dir, database)
+
+        return {
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'commit': self._git_commit(),
+            'python': platform.python_version(),
+            'benchmarks': benchmarks,
+            'serializers': serializers,
+        }
+
+    @property
+    def app_paths(self) -> List[str]:
+        return [os.path.abspath(self.app_dir), os.path.abspath(self.example_dir)]
+
+    def _run_benchmark(self, config: BenchmarkConfig) -> Dict:
+        handler_dir = os.path.join(self.build_dir, config.resolver.name)
+        os.makedirs(handler_dir, exist_ok=True)
+
+        with open(os.path.join(handler_dir, 'resolver.py'), 'wb') as handler_file:
+            handler_file.write(generate_handler(config.resolver))
+
+        cold_starts = []
+        for _ in range(self.cold_runs):
+            started_at = perf_counter()
+            cold_start = self._run_worker('cold', handler_dir)
+            cold_start['process_ms'] = (perf_counter() - started_at) * 1000
+            cold_starts.append(cold_start)
+
+        warm = self._run_worker('warm', handler_dir, {
+            'name': config.resolver.name,
+            'events': os.path.join(self.fixtures_dir, config.events),
+            'iterations': self.iterations or config.iterations or ITERATIONS,
+        })
+
+        return {
+            'cold_start': {
+                'import_ms': self._summarize([cold_start['import_ms'] for cold_start in cold_starts]),
+                'process_ms': self._summarize([cold_start['process_ms'] for cold_start in cold_starts]),
+                'init_timings_ms': cold_starts[-1]['init_timings_ms'],
+            },
+            'warm': warm,
+        }
+
+    def _write_settings(self, test_database_name: str):
+        """Settings of the App pointing at the test database, so the handler's import connects to it."""
+        with open(os.path.join(self.build_dir, f'{self.settings_module}.py'), 'w') as settings_file:
+            settings_file.write(
+                f'from {self.settings} import *  # noqa: F401,F403\n'
+                f'\n'
+                f"DATABASES = {{**DATABASES, 'default': {{**DATABASES['default'], 'NAME': {test_database_name!r}}}}}\n"
+            )
+
+    def _run_worker(self, mode: str, handler_dir: str, parameters: Dict = None, settings: str = None) -> Dict:
+        environment = {
+            **os.environ,
+            'PYTHONPATH': os.pathsep.join([handler_dir, self.build_dir, *self.app_paths]),
+            'DJANGO_SETTINGS_MODULE': settings or self.settings_module,
+        }
+
+        with tempfile.NamedTemporaryFile(suffix='.json') as output_file:
+            process = subprocess.run(
+                [sys.executable, self.worker_file, mode, output_file.name, json.dumps(parameters or {})],
+                env=environment,
+                stdout=subprocess.DEVNULL,  # The handler's logs and EMF metrics
+                stderr=subprocess.PIPE,
+            )
+            if process.returncode != 0:
+                raise RuntimeError(f'Benchmark worker {mode} failed:\n{process.stderr.decode("utf-8")}')
+
+            return json.load(output_file)
+
+    @staticmethod
+    def _summarize(values: List[float]) -> Dict[str, float]:
+        ordered = sorted(values)
+        return {'p50': round(ordered[len(ordered) // 2], 4), 'min': round(ordered[0], 4), 'max': round(ordered[-1], 4)}
+
+    @staticmethod
+    def _git_commit() -> Optional[str]:
+        try:
+            return subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+
+def metric_of(report: Dict, path: str):
+    value = report
+    for key in path.split('.'):
+        if not isinstance(value, dict) or key not in value:
+            return None
+        value = value[key]
+
+    return value
+
+
+def compare(report: Dict, baseline: Dict) -> List[Dict]:
+    """Every gated metric of the report next to the baseline's, flagged when it regressed over the tolerance."""
+    comparisons = []
+
+    sections = [(f'benchmarks.{name}', name) for name in report['benchmarks']] + [('', None)]
+
+    for section, benchmark in sections:
+        for path, (tolerance, slack) in GATES.items():
+            if (benchmark is None) != path.startswith('serializers.'):
+                continue
+
+            full_path = f'{section}.{path}' if section else path
+            current, previous = metric_of(report, full_path), metric_of(baseline, full_path)
+            if current is None or previous is None:
+                continue
+
+            comparisons.append({
+                'metric': full_path,
+                'baseline': previous,
+                'current': current,
+                'change': None if previous == 0 else round((current - previous) / previous, 4),
+                'regressed': current > previous * (1 + tolerance) + slack,
+            })
+
+    return comparisons
@@ -0,0 +1,243 @@
+"""Runs one benchmark step in a fresh interpreter, started by `runner.py`.
+
+    python worker.py <mode> <output path> [<parameters as JSON>]
+
+The interpreter's path holds the built `resolver.py` and the layer packages, like a lambda container does. Nothing from
+the deployer (CDK) is imported here. Results are written as JSON to the output path, since stdout gets the handler's
+logs and metrics.
+"""
+import gc
+import json
+import sys
+import tracemalloc
+from datetime import datetime, date
+from time import perf_counter
+from types import GeneratorType
+from uuid import UUID, uuid4
+
+worker_started_at = perf_counter()
+
+
+class LambdaContext:
+    memory_limit_in_mb = 192
+
+    def __init__(self, function_name: str):
+        self.function_name = function_name
+        self.aws_request_id = str(uuid4())
+
+    @staticmethod
+    def get_remaining_time_in_millis():
+        return 15000
+
+
+def percentiles(values):
+    ordered = sorted(values)
+
+    def percentile(q):
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 4)
+
+    return {
+        'p50': percentile(0.5),
+        'p90': percentile(0.9),
+        'p99': percentile(0.99),
+        'mean': round(sum(ordered) / len(ordered), 4),
+        'max': round(ordered[-1], 4),
+    }
+
+
+def setup(parameters):
+    """Creates (or reuses) the test database on the configured Postgres and loads the Django fixtures in it."""
+    import django
+    from django.core.management import call_command
+    from django.db import connection
+
+    django.setup(set_prefix=False)
+
+    database_name = connection.settings_dict['NAME']
+    test_database_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=True)
+
+    if parameters['django_fixtures']:
+        call_command('loaddata', *parameters['django_fixtures'], verbosity=0)
+
+    return {'database_name': database_name, 'test_database_name': test_database_name}
+
+
+def teardown(parameters):
+    import django
+    from django.db import connection
+
+    django.setup(set_prefix=False)
+    connection.creation.destroy_test_db(parameters['database_name'], verbosity=0)
+
+    return {}
+
+
+def cold(_parameters):
+    """Imports the handler as the lambda runtime does on a cold start, which also runs its init pipeline."""
+    started_at = perf_counter()
+    import resolver  # noqa: F401
+    import_ms = (perf_counter() - started_at) * 1000
+
+    from django_serverless.warm_start import init_pipeline
+
+    return {
+        'import_ms': round(import_ms, 4),
+        'interpreter_ms': round((started_at - worker_started_at) * 1000, 4),
+        'init_timings_ms': {name: round(timing, 4) for name, timing in init_pipeline.timings.items()},
+    }
+
+
+def invoke(handler, event, function_name):
+    from django.db import connection
+
+    queries = 0
+
+    def count_query(execute, sql, params, many, context):
+        nonlocal queries
+        queries += 1
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(count_query):
+        handler(event, LambdaContext(function_name))
+
+    return queries
+
+
+def warm(parameters):
+    """Replays the events against the imported handler, once for latency and once traced, for allocations."""
+    from resolver import resolver as handler
+
+    with open(parameters['events']) as events_file:
+        events = json.load(events_file)
+
+    function_name = parameters['name']
+    iterations = parameters['iterations']
+
+    started_at = perf_counter()
+    first_queries = invoke(handler, events[0], function_name)
+    first_invocation_ms = (perf_counter() - started_at) * 1000
+
+    latencies = []
+    queries = []
+    errors = 0
+    error = None
+
+    for i in range(iterations):
+        event = events[i % len(events)]
+        started_at = perf_counter()
+        try:
+            queries.append(invoke(handler, event, function_name))
+        except Exception as e:
+            errors += 1
+            error = error or repr(e)
+        latencies.append((perf_counter() - started_at) * 1000)
+
+    # Latency of the last tenth of the invocations relative to the first tenth, flat is ~1
+    window = max(1, iterations // 10)
+    latency_drift = percentiles(latencies[-window:])['p50'] / max(percentiles(latencies[:window])['p50'], 1e-6)
+
+    gc.collect()
+    tracemalloc.start()
+    baseline_memory, _ = tracemalloc.get_traced_memory()
+    peaks = []
+
+    for i in range(iterations):
+        if hasattr(tracemalloc, 'reset_peak'):  # Python 3.9+, otherwise the peak is the peak of the whole pass
+            tracemalloc.reset_peak()
+        current_memory, _ = tracemalloc.get_traced_memory()
+        try:
+            invoke(handler, events[i % len(events)], function_name)
+        except Exception:
+            pass
+        _, peak_memory = tracemalloc.get_traced_memory()
+        peaks.append(peak_memory - current_memory)
+
+    gc.collect()
+    final_memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'iterations': iterations,
+        'first_invocation_ms': round(first_invocation_ms, 4),
+        'first_invocation_queries': first_queries,
+        'latency_ms': percentiles(latencies),
+        'latency_drift': round(latency_drift, 4),
+        'queries_per_invocation': round(sum(queries) / max(len(queries), 1), 4),
+        'peak_kib': round(max(peaks) / 1024, 4),
+        'memory_growth_kib': round((final_memory - baseline_memory) / 1024, 4),
+        'errors': errors,
+        'error': error,
+    }
+
+
+def legacy_serialize_value(value):
+    """`serialize_value` before `django_serverless.serializers`, an isinstance chain."""
+    if isinstance(value, UUID):
+        return str(value)
+
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+    if isinstance(value, date):
+        return value.strftime('%Y-%m-%d')
+
+    if isinstance(value, GeneratorType):
+        return list(value)
+
+    return value
+
+
+def serializers(parameters):
+    """Serializes every value of the rows with the current and the legacy serializer, on types both support."""
+    from django_serverless.serializers import serialize_value
+
+    rows = [
+        {
+            'id': uuid4(),
+            'name': f'name {i}',
+            'count': i,
+            'ratio': i / 3,
+            'is_active': i % 2 == 0,
+            'deleted_at': None,
+            'created_at': datetime(2021, 1, 1, 12, 30, i % 60),
+            'birthday': date(1990, 1, 1 + i % 28),
+        }
+        for i in range(parameters['rows'])
+    ]
+
+    def time_serializer(serializer):
+        timings = []
+        for _ in range(parameters['repeat']):
+            started_at = perf_counter()
+            for row in rows:
+                for value in row.values():
+                    serializer(value)
+            timings.append((perf_counter() - started_at) * 1000)
+
+        return round(min(timings), 4)
+
+    legacy_ms = time_serializer(legacy_serialize_value)
+    current_ms = time_serializer(serialize_value)
+
+    return {
+        'rows': parameters['rows'],
+        'legacy_ms': legacy_ms,
+        'current_ms': current_ms,
+        'speedup': round(legacy_ms / current_ms, 4),
+    }
+
+
+MODES = {
+    'setup': setup,
+    'teardown': teardown,
+    'cold': cold,
+    'warm': warm,
+    'serializers': serializers,
+}
+
+if __name__ == '__main__':
+    mode, output_path = sys.argv[1], sys.argv[2]
+    result = MODES[mode](json.loads(sys.argv[3]) if len(sys.argv) > 3 else {})
+
+    with open(output_path, 'w') as output_file:
+        json.dump(result, output_file)
@@ -1,6 +1,6 @@
 import os
 from dataclasses import dataclass, field
-from typing import List
+from typing import Dict, List
 
 from aws_cdk import aws_lambda
 
@@ -51,6 +51,9 @@ class LayerConfig:
     requirements: List[str] = field(default_factory=list)
 
 
+REST_OPERATIONS = ['GET', 'POST', 'PUT', 'PATCH', 'DELETE']
+
+
 @dataclass
 class ResolverConfig:
     name: str = field()
@@ -63,4 +66,31 @@ class ResolverConfig:
     input_type: str = field(default='None')
     rest_path: str = field(default='')
     scale_on_usage: bool = field(default=False)
-    persist_model_connection: str = field(default=None)
+    persist_model_connection: bool = field(default=False)  # Keeps the DB connection open, see `ConnectionKeeper`
+    optimize_queries: bool = field(default=True)
+    prune_columns: bool = field(default=True)
+    stream_chunk_size: int = field(default=None)
+    max_results: int = field(default=None)
+    batch_size: int = field(default=None)  # AppSync BatchInvoke size, for nested fields' `@batch_resolver`s
+    cache_ttl: int = field(default=None)  # Seconds a Query response is cached in the container, None to disable
+    cache_max_bytes: int = field(default=8 * 1024 * 1024)
+    cache_identity: str = field(default=None)  # None (shared by all callers) | 'user' | 'header:<name>'
+    max_concurrency: int = field(default=10)  # `async def resolve_*` calls awaited at once per level of the response
+    compression_min_size: int = field(default=1024)  # Bytes from which REST responses are compressed, None to disable
+    priming_events: List[Dict] = field(default_factory=list)  # Read-only events replayed on warmer events to fill caches
+    priming_hook: str = field(default=None)  # Dotted path to a function called on warmer events
+    warm_concurrency: int = field(default=1)  # Sandboxes the warmer keeps warm at once, the ceiling if not static, 0 to not warm
+    warm_policy: str = field(default='static')  # 'static' | 'predictive' (as forecast) | 'adaptive' (in busy hours)
+    warm_schedule: str = field(default=None)  # When the warmer runs (UTC), see `WARM_SCHEDULE` in `LambdasStack`
+
+    @property
+    def is_rest(self):
+        return self.operation in REST_OPERATIONS
+
+
+@dataclass
+class BenchmarkConfig:
+    resolver: ResolverConfig = field()
+    events: str = field()  # JSON file with a list of recorded lambda events, relative to `benchmarks/fixtures`
+    django_fixtures: List[str] = field(default_factory=list)  # Loaded with `loaddata` into the benchmark database
+    iterations: int = field(default=None)  # Warm invocations replayed, None for the harness' ITERATIONS
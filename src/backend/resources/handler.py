@@ -0,0 +1,17 @@
+import importlib.util
+import os
+
+from src.backend.dataclasses import ResolverConfig
+from src.backend.resources.handler_append import generate_append
+from src.backend.resources.handler_prepend import generate_prepend
+
+
+def generate_handler(config: ResolverConfig) -> bytes:
+    """Content of the lambda's `resolver.py`: the resolver's source file between the handler prepend and append."""
+    source_path = importlib.util.find_spec(config.path).origin
+    if not os.path.exists(source_path):
+        raise ValueError(
+            f'Handler path {source_path} doesnt exists! Setup was probably done incorrectly and the deploy app cant find the code!')
+
+    with open(source_path, 'rb') as source_file:
+        return generate_prepend(config) + source_file.read() + generate_append(config)
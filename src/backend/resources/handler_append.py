@@ -3,11 +3,25 @@ from src.backend.dataclasses import ResolverConfig
 __query_content = r'''
 """ HANDLER APPEND START """
 
-MODEL_CONNECTION
+init_pipeline.mark('handler_module')
 
 from django_serverless.appsync_to_wsgi import appsync_to_wsgi_of
-
-resolver = appsync_to_wsgi_of(TYPENAME, is_list=IS_LIST, is_paginated=IS_PAGINATED)(resolver)
+from django_serverless.connection import connection_keeper
+from django_serverless.warm_start import freeze_heap, import_modules, prepare_models
+
+resolver = appsync_to_wsgi_of(TYPENAME, is_list=IS_LIST, is_paginated=IS_PAGINATED,
+                              optimize_queries=OPTIMIZE_QUERIES, prune_columns=PRUNE_COLUMNS,
+                              stream_chunk_size=STREAM_CHUNK_SIZE, max_results=MAX_RESULTS,
+                              cache_ttl=CACHE_TTL, cache_max_bytes=CACHE_MAX_BYTES,
+                              cache_identity=CACHE_IDENTITY, max_concurrency=MAX_CONCURRENCY,
+                              priming_events=PRIMING_EVENTS, priming_hook=PRIMING_HOOK, batch=IS_BATCH)(resolver)
+
+init_pipeline.step('import_modules', import_modules)
+init_pipeline.step('prepare_models', prepare_models)
+init_pipeline.step('prepare_resolver', resolver.prepare)
+MODEL_CONNECTION
+init_pipeline.step('freeze_heap', freeze_heap)
+init_pipeline.run()
 
 """ HANDLER APPEND END """
 
@@ -17,11 +31,23 @@ resolver = appsync_to_wsgi_of(TYPENAME, is_list=IS_LIST, is_paginated=IS_PAGINAT
 __mutation_content = r'''
 """ HANDLER APPEND START """
 
-MODEL_CONNECTION
+init_pipeline.mark('handler_module')
 
 from django_serverless.appsync_to_wsgi import appsync_to_wsgi_of
+from django_serverless.connection import connection_keeper
+from django_serverless.warm_start import freeze_heap, import_modules, prepare_models
 
-resolver = appsync_to_wsgi_of(TYPENAME, input_type=INPUT_TYPE)(TYPENAME.mutate)
+resolver = appsync_to_wsgi_of(TYPENAME, input_type=INPUT_TYPE,
+                              optimize_queries=OPTIMIZE_QUERIES, prune_columns=PRUNE_COLUMNS,
+                              max_concurrency=MAX_CONCURRENCY,
+                              priming_events=PRIMING_EVENTS, priming_hook=PRIMING_HOOK)(TYPENAME.mutate)
+
+init_pipeline.step('import_modules', import_modules)
+init_pipeline.step('prepare_models', prepare_models)
+init_pipeline.step('prepare_resolver', resolver.prepare)
+MODEL_CONNECTION
+init_pipeline.step('freeze_heap', freeze_heap)
+init_pipeline.run()
 
 """ HANDLER APPEND END """
 
@@ -31,11 +57,19 @@ resolver = appsync_to_wsgi_of(TYPENAME, input_type=INPUT_TYPE)(TYPENAME.mutate)
 __rest_content = r'''
 """ HANDLER APPEND START """
 
-MODEL_CONNECTION
+init_pipeline.mark('handler_module')
 
 from django_serverless.appsync_to_wsgi import apigateway_to_wsgi
+from django_serverless.connection import connection_keeper
+from django_serverless.warm_start import freeze_heap, import_modules
 
-resolver = apigateway_to_wsgi(TYPENAME)
+resolver = apigateway_to_wsgi(TYPENAME, compression_min_size=COMPRESSION_MIN_SIZE,
+                              priming_events=PRIMING_EVENTS, priming_hook=PRIMING_HOOK)
+
+init_pipeline.step('import_modules', import_modules)
+MODEL_CONNECTION
+init_pipeline.step('freeze_heap', freeze_heap)
+init_pipeline.run()
 
 """ HANDLER APPEND END """
 
@@ -44,7 +78,7 @@ resolver = apigateway_to_wsgi(TYPENAME)
 
 
 def generate_append(config: ResolverConfig):
-    if config.operation in ['GET', 'POST']:
+    if config.is_rest:
         content = __rest_content
     else:
         is_mutation = config.operation == 'Mutation'
@@ -54,8 +88,20 @@ def generate_append(config: ResolverConfig):
         .replace('TYPENAME', config.graphene_type) \
         .replace('IS_LIST', str(config.is_list)) \
         .replace('IS_PAGINATED', str(config.is_paginated)) \
+        .replace('IS_BATCH', str(config.batch_size is not None)) \
         .replace('INPUT_TYPE', str(config.input_type)) \
+        .replace('OPTIMIZE_QUERIES', str(config.optimize_queries)) \
+        .replace('PRUNE_COLUMNS', str(config.prune_columns)) \
+        .replace('STREAM_CHUNK_SIZE', str(config.stream_chunk_size)) \
+        .replace('MAX_RESULTS', str(config.max_results)) \
+        .replace('CACHE_TTL', str(config.cache_ttl)) \
+        .replace('CACHE_MAX_BYTES', str(config.cache_max_bytes)) \
+        .replace('CACHE_IDENTITY', repr(config.cache_identity)) \
+        .replace('MAX_CONCURRENCY', str(config.max_concurrency)) \
+        .replace('COMPRESSION_MIN_SIZE', str(config.compression_min_size)) \
         .replace('MODEL_CONNECTION',
-                 '' if config.persist_model_connection is None else
-                 f'{config.persist_model_connection}.objects.first()') \
+                 "init_pipeline.step('db_connection', connection_keeper.open)" if config.persist_model_connection else
+                 '') \
+        .replace('PRIMING_HOOK', repr(config.priming_hook)) \
+        .replace('PRIMING_EVENTS', repr(config.priming_events)) \
         .encode('utf-8')
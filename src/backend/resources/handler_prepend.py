@@ -4,6 +4,9 @@ __content = r'''
 """ HANDLER PREPEND START """
 
 
+from time import perf_counter
+init_started_at = perf_counter()
+
 import os
 
 import django
@@ -12,8 +15,12 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'your_project.settings')
 
 django.setup(set_prefix=False)
 
-from django.conf import settings
-settings.CONN_MAX_AGE = PERSISTENT_CONNECTION
+from django_serverless.connection import configure_conn_max_age, configure_keepalives
+configure_conn_max_age(PERSISTENT_CONNECTION)
+configure_keepalives()
+
+from django_serverless.warm_start import init_pipeline
+init_pipeline.mark('django_setup', since=init_started_at)
 
 
 """ HANDLER PREPEND END """
@@ -24,5 +31,5 @@ settings.CONN_MAX_AGE = PERSISTENT_CONNECTION
 
 def generate_prepend(config: ResolverConfig):
     return __content \
-        .replace('PERSISTENT_CONNECTION', '60' if config.persist_model_connection is None else 'None') \
+        .replace('PERSISTENT_CONNECTION', 'None' if config.persist_model_connection else '60') \
         .encode('utf-8')
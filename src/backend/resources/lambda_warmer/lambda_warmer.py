@@ -1,13 +1,28 @@
 import json
+import math
 import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, replace
 from time import time as now
+from typing import Dict, List, Optional
 
 import boto3
+from botocore.config import Config
 
+MAX_WORKERS = 64  # Invocations in flight at once, across all the functions
+HOLD_MS = 500  # How long each warm invocation is held, so the invocations of a function overlap and land in N sandboxes
 
-MAX_CONCURRENT_LAMBDAS = 2
+LOOKBACK_MINUTES = 15  # Traffic history the predictive warming forecasts from
+PEAK_MINUTES = 5  # The forecast is at least the peak of these last minutes
+HORIZON_MINUTES = 3  # Until the next warmer run
+MAX_METRIC_QUERIES = 500  # Per GetMetricData request
+PROFILE_DAYS = 14  # Traffic history of the adaptive warming's hour of the day profiles
+PROFILE_TTL_HOURS = 6
 
-env_name = os.environ['env_name']
+env_name = os.environ.get('env_name')
+budget = int(os.environ.get('budget', 50))  # Warm invocations per run, across all the functions
+min_activity = float(os.environ.get('min_activity', 0.25))  # Share of days with traffic in an hour to warm in it
+METRICS_NAMESPACE = os.environ.get('metrics_namespace', 'DjangoServerless')
 arn_prefix = 'arn:aws:lambda'
 
 
@@ -16,80 +31,360 @@ def lambda_name_from_arn(arn: str):
     return arn_parts[-2]
 
 
-# Last stable, keys are numbers
-lambdas_name_to_arn = {
-    lambda_name_from_arn(lambda_arn): lambda_arn
-    for _, lambda_arn in os.environ.items()
-    if lambda_arn.startswith(arn_prefix)
-}
+@dataclass
+class WarmTarget:
+    name: str
+    arn: str
+    concurrency: int  # Sandboxes kept warm at once, the most that are with the predictive and adaptive policies
+    policy: str = 'static'  # 'static' | 'predictive' | 'adaptive'
 
-# lambdas_name_to_arn = {
-#     lambda_name_from_arn(lambda_arn): lambda_arn
-#     for lambda_arn in os.environ.get('targets')
-# }
 
+def read_targets(environment: Dict[str, str]) -> List[WarmTarget]:
+    """Functions to warm, from the `f<i>` (ARN), `c<i>` (concurrency) and `p<i>` (policy) variables of `LambdasStack`."""
+    # Last stable, keys are numbers
+    return [
+        WarmTarget(lambda_name_from_arn(lambda_arn), lambda_arn, int(environment.get(f'c{key[1:]}', 1)),
+                   environment.get(f'p{key[1:]}', 'static'))
+        for key, lambda_arn in environment.items()
+        if key.startswith('f') and key[1:].isdigit() and lambda_arn.startswith(arn_prefix)
+    ]
 
-def metric_for(func_name):
-    return {
-        'Namespace': 'AWS/Lambda',
-        'MetricName': 'ConcurrentExecutions',
-        'Dimensions': [
-            {'Name': 'FunctionName', 'Value': func_name},
-            {'Name': 'Resource', 'Value': f'{func_name}:{env_name}'}
+
+warm_targets = read_targets(dict(os.environ))
+
+
+class Clients:
+    """boto3 clients, created on first use. Replace them (e.g. with stubs) before calling `warm`."""
+
+    def __init__(self):
+        self._cloudwatch = None
+        self._lambda = None
+
+    @property
+    def cloudwatch(self):
+        if self._cloudwatch is None:
+            self._cloudwatch = boto3.client('cloudwatch')
+        return self._cloudwatch
+
+    @property
+    def lambda_(self):
+        if self._lambda is None:
+            # One pooled connection per worker, otherwise the parallel invocations queue on urllib3's pool
+            self._lambda = boto3.client('lambda', config=Config(max_pool_connections=MAX_WORKERS))
+        return self._lambda
+
+
+clients = Clients()
+
+
+def warm_payload(hold_ms: int):
+    return json.dumps({'is_test_payload_to_warm_lambda': True, 'hold_ms': hold_ms})
+
+
+def metric_queries(index: int, target: WarmTarget, period: int) -> List[Dict]:
+    """The function's peak concurrency per period, its invocations that weren't warmer events and its warm invocations.
+
+    The warm invocations show up in `ConcurrentExecutions` too. The handlers' own metrics (see
+    `django_serverless.metrics`) tell whether there was traffic at all, and the warmer's `WarmInvocations` (see
+    `emit_warm_metrics`) how many of the concurrent executions were its own.
+    """
+    function_name = lambda_name_from_arn(target.arn)
+
+    return [
+        {
+            'Id': f'c{index}',
+            'MetricStat': {
+                'Metric': {
+                    'Namespace': 'AWS/Lambda',
+                    'MetricName': 'ConcurrentExecutions',
+                    'Dimensions': [
+                        {'Name': 'FunctionName', 'Value': function_name},
+                        {'Name': 'Resource', 'Value': f'{function_name}:{env_name}'},
+                    ],
+                },
+                'Period': period,
+                'Stat': 'Maximum',
+            },
+        },
+        {
+            'Id': f'i{index}',
+            'MetricStat': {
+                'Metric': {
+                    'Namespace': METRICS_NAMESPACE,
+                    'MetricName': 'TotalTime',
+                    'Dimensions': [{'Name': 'Resolver', 'Value': function_name}],
+                },
+                'Period': period,
+                'Stat': 'SampleCount',
+            },
+        },
+        {
+            'Id': f'w{index}',
+            'MetricStat': {
+                'Metric': {
+                    'Namespace': METRICS_NAMESPACE,
+                    'MetricName': 'WarmInvocations',
+                    'Dimensions': [{'Name': 'Resolver', 'Value': function_name}],
+                },
+                'Period': period,
+                'Stat': 'Maximum',
+            },
+        },
+    ]
+
+
+def fetch_peaks(targets: List[WarmTarget], cloudwatch, start: int, end: int, period: int) -> Dict[str, List[float]]:
+    """Peak concurrency of every target for each period from `start` to `end` (in periods since the epoch), oldest first.
+
+    Fetched with batched GetMetricData requests (one for up to 166 functions). Only traffic counts: periods without
+    traffic are 0 and the warm invocations are taken off the periods the warmer ran in, so warming doesn't sustain
+    itself.
+    """
+    queries = [query for index, target in enumerate(targets) for query in metric_queries(index, target, period)]
+    values: Dict[str, Dict[int, float]] = {}  # query id -> period -> value
+
+    for batch_start in range(0, len(queries), MAX_METRIC_QUERIES):
+        request = {
+            'MetricDataQueries': queries[batch_start:batch_start + MAX_METRIC_QUERIES],
+            'StartTime': start * period,
+            'EndTime': end * period,
+            'ScanBy': 'TimestampAscending',
+        }
+
+        while True:
+            response = cloudwatch.get_metric_data(**request)
+            for result in response['MetricDataResults']:
+                values.setdefault(result['Id'], {}).update({
+                    int(timestamp.timestamp()) // period: value
+                    for timestamp, value in zip(result['Timestamps'], result['Values'])
+                })
+
+            if 'NextToken' not in response:
+                break
+            request['NextToken'] = response['NextToken']
+
+    peaks = {}
+    for index, target in enumerate(targets):
+        concurrency, invocations = values.get(f'c{index}', {}), values.get(f'i{index}', {})
+        warm_invocations = values.get(f'w{index}', {})
+        peaks[target.name] = [
+            max(concurrency.get(number, 0.0) - warm_invocations.get(number, 0.0), 0.0)
+            if invocations.get(number, 0) > 0 else 0.0
+            for number in range(start, end)
         ]
-    }
 
+    return peaks
+
+
+def fetch_concurrency(targets: List[WarmTarget], cloudwatch, end: Optional[float] = None) -> Dict[str, List[float]]:
+    """Peak concurrency of every target for each of the last LOOKBACK_MINUTES minutes, oldest first."""
+    end_minute = int(end if end is not None else now()) // 60
+    return fetch_peaks(targets, cloudwatch, end_minute - LOOKBACK_MINUTES, end_minute, 60)
+
+
+@dataclass
+class TrafficProfile:
+    """Traffic of a function per hour of the day (UTC), over the last PROFILE_DAYS days."""
+    activity: List[float]  # Share of the days with traffic in the hour
+    peak: List[int]  # Average peak concurrency in the hour, on the days with traffic
+
+    @classmethod
+    def of(cls, hourly_peaks: List[float], start_hour: int) -> 'TrafficProfile':
+        """Profile of hourly peak concurrencies, the first one at `start_hour` (hour of the day)."""
+        days, active_peaks = [0] * 24, [[] for _ in range(24)]
+
+        for offset, peak in enumerate(hourly_peaks):
+            hour = (start_hour + offset) % 24
+            days[hour] += 1
+            if peak > 0:
+                active_peaks[hour].append(peak)
+
+        return cls(
+            activity=[len(peaks) / count if count else 0.0 for peaks, count in zip(active_peaks, days)],
+            peak=[math.ceil(sum(peaks) / len(peaks)) if peaks else 0 for peaks in active_peaks],
+        )
+
+
+def fetch_profiles(targets: List[WarmTarget], cloudwatch, end: Optional[float] = None) -> Dict[str, TrafficProfile]:
+    """Profiles of the last PROFILE_DAYS days, from the peaks per minute.
+
+    Hourly peaks can't be fetched as such: the Maximum of an hour mixes the warm invocations of one minute with the
+    traffic of another, so the warm invocations are only taken off minute by minute (see `fetch_peaks`).
+    """
+    end_hour = int(end if end is not None else now()) // 3600
+    start_hour = end_hour - PROFILE_DAYS * 24
+
+    profiles = {}
+    for name, minute_peaks in fetch_peaks(targets, cloudwatch, start_hour * 60, end_hour * 60, 60).items():
+        hourly_peaks = [max(minute_peaks[offset:offset + 60]) for offset in range(0, len(minute_peaks), 60)]
+        profiles[name] = TrafficProfile.of(hourly_peaks, start_hour % 24)
 
-def get_max_metric_result(metric):
-    print(f'metric is {metric}')
-    results = metric['MetricDataResults'][0]
-    values = results['Values']
+    return profiles
 
-    return min(int(max(values)) if len(values) > 0 else 1, MAX_CONCURRENT_LAMBDAS)
 
+class ProfileCache:
+    """Traffic profiles kept by the warmer's container, fetched again every PROFILE_TTL_HOURS."""
 
-cloudwatch = boto3.client('cloudwatch')
-lambda_client = boto3.client('lambda')
+    def __init__(self):
+        self.profiles: Dict[str, TrafficProfile] = {}
+        self.fetched_at: float = 0
 
+    def profiles_of(self, targets: List[WarmTarget], cloudwatch) -> Dict[str, TrafficProfile]:
+        is_expired = now() - self.fetched_at > PROFILE_TTL_HOURS * 3600
+        if is_expired or any(target.name not in self.profiles for target in targets):
+            self.profiles.update(fetch_profiles(targets, cloudwatch))
+            self.fetched_at = now()
 
-def inow():
-    return int(now())
+        return {target.name: self.profiles[target.name] for target in targets}
 
 
-payload = json.dumps({'is_test_payload_to_warm_lambda': True})
+profile_cache = ProfileCache()
 
 
-def _warm_function_predictive(lambda_name: str, lambda_arn: str):
-    """Triggers a dumb execution of a lambda to keep it warm.
-    Calculates how many executions happened in the last 5 minutes and predicts how many instances should be kept warm.
+def forecast_concurrency(series: List[float]) -> int:
+    """Sandboxes needed for the next HORIZON_MINUTES: the recent peak, or more if the trend is rising."""
+    if not any(series):
+        return 0
 
-    Not used since it's an overkill for now.
+    peak = max(series[-PEAK_MINUTES:])
+
+    # Least squares slope, in concurrency per minute
+    count = len(series)
+    mean_x, mean_y = (count - 1) / 2, sum(series) / count
+    variance = sum((x - mean_x) ** 2 for x in range(count))
+    slope = sum((x - mean_x) * (y - mean_y) for x, y in enumerate(series)) / variance if variance else 0.0
+    projected = series[-1] + slope * HORIZON_MINUTES
+
+    return max(0, math.ceil(max(peak, projected)))
+
+
+def is_worth_warming(profile: TrafficProfile, at: float) -> bool:
+    """Whether the hour of the day of `at` usually has traffic, often enough to pay for warming."""
+    return profile.activity[int(at) // 3600 % 24] >= min_activity
+
+
+def adaptive_demand(forecast: int, profile: TrafficProfile, at: float) -> int:
+    """Sandboxes an adaptive target asks for: none in its quiet hours, unless it has traffic now.
+
+    In its busy hours, the usual peak of the hour, so the warm capacity is there before the traffic ramps up.
+    """
+    if not is_worth_warming(profile, at):
+        return forecast
+
+    return max(forecast, profile.peak[int(at) // 3600 % 24])
+
+
+def plan_concurrency(targets: List[WarmTarget], demands: Dict[str, int], budget: int) -> List[WarmTarget]:
+    """How many sandboxes to warm per target, within their ceiling (`concurrency`) and the global budget.
+
+    Static targets ask for their `concurrency`, the others for their demand (e.g. their forecast). When the budget is
+    short, it's handed out one sandbox at a time to the targets that still need the most, so hot resolvers keep their
+    capacity.
     """
-    five_min_ago = inow() - 5 * 60
-    end = inow()
-
-    # get concurrency value
-    metric_id = 'concurrent_executions'
-    result = cloudwatch.get_metric_data(
-        MetricDataQueries=[
-            dict(Id=metric_id, MetricStat=dict(Metric=metric_for(lambda_name), Period=60, Stat='Maximum'))
-        ],
-        StartTime=five_min_ago, EndTime=end)
-    concurrency_value = get_max_metric_result(result)
-    print(f'concurrency for {lambda_name} is {concurrency_value}')
-
-    # invoke async for _ in range(concurrency_value)
-    for _ in range(concurrency_value):
-        lambda_client.invoke(FunctionName=lambda_arn, Payload=payload, InvocationType='Event')
-
-
-def _warm_function(lambda_name: str, lambda_arn: str):
-    """Triggers a single execution of the lambda to keep it warm for the next 5min.
+    demand = {
+        target.name: target.concurrency if target.policy == 'static' else min(demands.get(target.name, 0),
+                                                                               target.concurrency)
+        for target in targets
+    }
+    granted = {name: 0 for name in demand}
+
+    remaining_budget = budget
+    while remaining_budget > 0:
+        missing = {name: demand[name] - granted[name] for name in demand if demand[name] > granted[name]}
+        if not missing:
+            break
+
+        for name in sorted(missing, key=missing.get, reverse=True)[:remaining_budget]:
+            granted[name] += 1
+            remaining_budget -= 1
+
+    return [replace(target, concurrency=granted[target.name]) for target in targets]
+
+
+def _invoke_warm(lambda_client, target: WarmTarget, hold_ms: int) -> Dict:
+    """A synchronous warm invocation, which the warm handler holds for `hold_ms` after priming the sandbox."""
+    try:
+        response = lambda_client.invoke(FunctionName=target.arn, Payload=warm_payload(hold_ms),
+                                        InvocationType='RequestResponse')
+        report = json.loads(response['Payload'].read() or 'null') or {}
+    except Exception as e:
+        return {'error': repr(e)}
+
+    if 'FunctionError' in response:
+        return {'error': report}
+
+    return report if isinstance(report, dict) else {}
+
+
+def warm(targets: List[WarmTarget], lambda_client, hold_ms: int = HOLD_MS) -> Dict[str, Dict]:
+    """Sends `concurrency` overlapping invocations to every target at once, so that many sandboxes are kept warm.
+
+    While a sandbox holds a warm invocation, Lambda routes the next ones to other sandboxes (starting them if needed).
+    Returns the number of invocations and priming failures per function.
     """
-    print(f'Warming {lambda_name}')
-    lambda_client.invoke(FunctionName=lambda_arn, Payload=payload, InvocationType='Event')
+    invocations = [target for target in targets for _ in range(max(target.concurrency, 0))]
+    if not invocations:
+        return {}
+
+    with ThreadPoolExecutor(max_workers=min(len(invocations), MAX_WORKERS)) as executor:
+        reports = list(executor.map(lambda target: _invoke_warm(lambda_client, target, hold_ms), invocations))
+
+    summary: Dict[str, Dict] = {}
+    for target, report in zip(invocations, reports):
+        function_summary = summary.setdefault(target.name, {'invocations': 0, 'failures': 0})
+        function_summary['invocations'] += 1
+        function_summary['failures'] += int('error' in report or report.get('primed') is False)
+
+    return summary
+
+
+def emit_warm_metrics(summary: Dict[str, Dict]):
+    """Emits the warm invocations sent to every function (CloudWatch Embedded Metric Format), see `fetch_peaks`."""
+    for function_name, function_summary in summary.items():
+        print(json.dumps({
+            '_aws': {
+                'Timestamp': int(now() * 1000),
+                'CloudWatchMetrics': [{
+                    'Namespace': METRICS_NAMESPACE,
+                    'Dimensions': [['Resolver']],
+                    'Metrics': [{'Name': 'WarmInvocations', 'Unit': 'Count'}],
+                }],
+            },
+            'Resolver': function_name,
+            'WarmInvocations': function_summary['invocations'],
+        }))
+
+
+def targets_of(event: Dict) -> List[WarmTarget]:
+    """Targets of a scheduled event, the functions sharing its schedule (`targets`, by name), or all of them."""
+    names = (event or {}).get('targets')
+    if names is None:
+        return warm_targets
+
+    return [target for target in warm_targets if target.name in names]
+
+
+def resolver(event, __):
+    targets = targets_of(event)
+    at = now() + HORIZON_MINUTES * 60  # Warming is for the traffic until the next run
+
+    dynamic_targets = [target for target in targets if target.policy != 'static']
+    concurrency = fetch_concurrency(dynamic_targets, clients.cloudwatch) if dynamic_targets else {}
+    demands = {name: forecast_concurrency(series) for name, series in concurrency.items()}
+
+    adaptive_targets = [target for target in targets if target.policy == 'adaptive']
+    if adaptive_targets:
+        profiles = profile_cache.profiles_of(adaptive_targets, clients.cloudwatch)
+        demands.update({
+            target.name: adaptive_demand(demands[target.name], profiles[target.name], at)
+            for target in adaptive_targets
+        })
+
+    targets = plan_concurrency(targets, demands, budget)
+    print(json.dumps({'demands': demands, 'plan': {target.name: target.concurrency for target in targets}}))
 
+    summary = warm(targets, clients.lambda_)
+    print(json.dumps({'warmed': summary}))
+    emit_warm_metrics(summary)
 
-def resolver(_, __):
-    for lambda_name, lambda_arn in lambdas_name_to_arn.items():
-        _warm_function(lambda_name, lambda_arn)
+    return summary
@@ -1,24 +1,37 @@
 import base64
-import io
+import inspect
 import json
-import re
-from cgi import FieldStorage
-from dataclasses import dataclass, field
-from datetime import datetime, date
-from types import GeneratorType
+from dataclasses import dataclass
+from functools import lru_cache
+from datetime import datetime
 from typing import Dict, Optional, List, Any, Callable
-from uuid import UUID
 
 import graphene
 from django.conf import settings
 from django.core.exceptions import ImproperlyConfigured
-from django.http import HttpRequest
-from django.http.response import HttpResponseBase, JsonResponse
+from django.db.models import QuerySet, prefetch_related_objects
+from django.http import HttpRequest, QueryDict
+from django.http.cookie import parse_cookie
+from django.http.response import HttpResponseBase
+from django.utils.datastructures import MultiValueDict
 from django.utils.module_loading import import_string
 
 import graphene_extender
 from graphene_extender.classes import ReverseModelTypeMeta
 
+from django_serverless import async_support
+from django_serverless.connection import with_connection_keeper
+from django_serverless.dataloader import Pending, dispatch_loaders
+from django_serverless.logger import logger, start_invocation
+from django_serverless.metrics import current_metrics, measure, metrics_state, with_invocation_metrics
+from django_serverless.multipart import close_files, parse_multipart
+from django_serverless.naming import camel_to_snake, snake_to_camel
+from django_serverless.query_optimizer import optimize_result
+from django_serverless.response import compress_response, to_apigateway_response
+from django_serverless.response_cache import MISSING, ResponseCache, identity_of, response_cache_key
+from django_serverless.serializers import dumps, serialize_value
+from django_serverless.warm_start import Primer
+
 
 class ResponseHolder(HttpResponseBase):
     def __init__(self, content: Any):
@@ -27,23 +40,167 @@ class ResponseHolder(HttpResponseBase):
         self.streaming = False
 
 
-@dataclass
+class HeaderMap(dict):
+    """Request headers, keyed by their lowercased name. Keys are lowercased once, when the map is built."""
+    __slots__ = ()
+
+    def __init__(self, headers: Optional[Dict[str, str]] = None):
+        super().__init__((key.lower(), value) for key, value in (headers or {}).items())
+
+    def __getitem__(self, key: str):
+        return super().__getitem__(key.lower())
+
+    def __setitem__(self, key: str, value):
+        super().__setitem__(key.lower(), value)
+
+    def __delitem__(self, key: str):
+        super().__delitem__(key.lower())
+
+    def __contains__(self, key):
+        return super().__contains__(key.lower() if isinstance(key, str) else key)
+
+    def get(self, key: str, default=None):
+        return super().get(key.lower(), default)
+
+    def pop(self, key: str, *args):
+        return super().pop(key.lower(), *args)
+
+    def setdefault(self, key: str, default=None):
+        return super().setdefault(key.lower(), default)
+
+    def update(self, other=(), **kwargs):
+        for key, value in dict(other, **kwargs).items():
+            self[key] = value
+
+
 class RequestHolder:
-    user: Optional[Dict]
-    headers: Dict
-    META: Dict
-    method: str
-    body: str
-    path: str
-    path_info: str
-    _get_raw_host: Callable
-    get_full_path: Callable
-    COOKIES: Dict = field(default_factory=dict)
-    FILES: Dict = field(default_factory=dict)
+    """The request given to the Django middlewares and to the resolvers, built from a Lambda event.
+
+    It only keeps references to the event: body, JSON body, GET, POST, FILES and COOKIES are computed the first time
+    they're read. Middlewares can still set their own attributes (e.g. `session`), which go to `__dict__`.
+    """
+    __slots__ = ('user', 'headers', 'method', 'path', 'path_info', 'dataloaders', 'raw_body', 'is_base64_encoded',
+                 'query_parameters', '_body', '_json', '_GET', '_POST', '_FILES', '_COOKIES', '__dict__')
+
+    def __init__(self, headers: HeaderMap, method: str, path: str, raw_body: Optional[str] = None,
+                 is_base64_encoded: bool = False, query_parameters: Optional[Dict[str, List[str]]] = None):
+        self.user = None
+        self.headers = headers
+        self.method = method
+        self.path = path
+        self.path_info = path
+        self.dataloaders: Dict = {}  # DataLoader class -> its instance for this request
+        self.raw_body = raw_body
+        self.is_base64_encoded = is_base64_encoded
+        self.query_parameters = query_parameters
+        self._body = None
+        self._json = MISSING
+        self._GET = None
+        self._POST = None
+        self._FILES = None
+        self._COOKIES = None
+
+    @property
+    def META(self):
+        return self.headers
+
+    @property
+    def body(self) -> bytes:
+        if self._body is None:
+            if not self.raw_body:
+                self._body = b''
+            elif self.is_base64_encoded:
+                self._body = base64.b64decode(self.raw_body)
+            else:
+                self._body = self.raw_body.encode('utf-8')
+
+        return self._body
+
+    @property
+    def json(self):
+        """The body parsed as JSON, None when there's no body."""
+        if self._json is MISSING:
+            self._json = json.loads(self.body) if self.body else None
+
+        return self._json
+
+    @property
+    def GET(self) -> QueryDict:
+        if self._GET is None:
+            self._GET = QueryDict(mutable=True)
+            for key, values in (self.query_parameters or {}).items():
+                self._GET.setlist(key, values)
+            self._GET._mutable = False
+
+        return self._GET
+
+    @property
+    def POST(self) -> QueryDict:
+        if self._POST is None:
+            self._load_post_and_files()
+
+        return self._POST
+
+    @property
+    def FILES(self) -> MultiValueDict:
+        if self._FILES is None:
+            self._load_post_and_files()
+
+        return self._FILES
+
+    @property
+    def COOKIES(self) -> Dict[str, str]:
+        if self._COOKIES is None:
+            self._COOKIES = parse_cookie(self.headers.get('cookie', ''))
+
+        return self._COOKIES
+
+    def _load_post_and_files(self):
+        content_type = self.headers.get('content-type', '')
+
+        if content_type.startswith('multipart/'):
+            # Multipart bodies are binary media types, so API Gateway base64 encodes them
+            self._POST, self._FILES = parse_multipart(self, self.raw_body or '', content_type,
+                                                      is_base64_encoded=self.is_base64_encoded)
+        elif content_type.startswith('application/x-www-form-urlencoded'):
+            self._POST, self._FILES = QueryDict(self.body, encoding=settings.DEFAULT_CHARSET), MultiValueDict()
+        else:
+            self._POST, self._FILES = QueryDict(), MultiValueDict()
+
+    def _get_raw_host(self):
+        return f'{self.headers["host"]}:{self.headers["x-forwarded-port"]}'
 
     def get_host(self):
         return HttpRequest.get_host(self)
 
+    def get_full_path(self):
+        return f'{self.path}?{self.GET.urlencode()}' if self.query_parameters else self.path
+
+    def close(self):
+        """Closes the uploaded files, if the body was parsed."""
+        if self._FILES is not None:
+            close_files(self._FILES)
+
+
+class AppSyncRequestHolder(RequestHolder):
+    """Request of an AppSync event, its body is the event's `info` as JSON, serialized the first time it's read."""
+    __slots__ = ('event_info', '_raw_body')
+
+    def __init__(self, headers: HeaderMap, event_info: Dict):
+        self.event_info = event_info
+        super().__init__(headers=headers, method='POST', path='/graphql')
+
+    @property
+    def raw_body(self) -> str:
+        if self._raw_body is None:
+            self._raw_body = dumps(self.event_info)
+
+        return self._raw_body
+
+    @raw_body.setter
+    def raw_body(self, raw_body: Optional[str]):
+        self._raw_body = raw_body
+
 
 @dataclass
 class ValueHolder:
@@ -73,6 +230,13 @@ class ResolveInfoHolder:
     context: RequestHolder
     field_name: str
     operation: OperationDefinitionHolder
+    cache_key: Any = None  # Of the response cache, set by the handler when it's enabled
+
+
+@dataclass
+class CachedContent:
+    """What the graphene middleware chain returns on a response cache hit, instead of the resolver's result."""
+    content: Any
 
 
 @dataclass
@@ -101,47 +265,6 @@ class AttrDict(dict):
         return super(AttrDict, self).get(attr)
 
 
-class CaseInsensitiveDict(dict):
-    @classmethod
-    def _k(cls, key):
-        return key.lower() if isinstance(key, str) else key
-
-    def __init__(self, *args, **kwargs):
-        super(CaseInsensitiveDict, self).__init__(*args, **kwargs)
-        self._convert_keys()
-
-    def __getitem__(self, key):
-        return super(CaseInsensitiveDict, self).__getitem__(self.__class__._k(key))
-
-    def __setitem__(self, key, value):
-        super(CaseInsensitiveDict, self).__setitem__(self.__class__._k(key), value)
-
-    def __delitem__(self, key):
-        return super(CaseInsensitiveDict, self).__delitem__(self.__class__._k(key))
-
-    def __contains__(self, key):
-        return super(CaseInsensitiveDict, self).__contains__(self.__class__._k(key))
-
-    def pop(self, key, *args, **kwargs):
-        return super(CaseInsensitiveDict, self).pop(self.__class__._k(key), *args, **kwargs)
-
-    def get(self, key, *args, **kwargs):
-        return super(CaseInsensitiveDict, self).get(self.__class__._k(key), *args, **kwargs)
-
-    def setdefault(self, key, *args, **kwargs):
-        return super(CaseInsensitiveDict, self).setdefault(self.__class__._k(key), *args, **kwargs)
-
-    def update(self, E=None, **F):
-        super(CaseInsensitiveDict, self).update(self.__class__(E))
-        super(CaseInsensitiveDict, self).update(self.__class__(**F))
-
-    def _convert_keys(self):
-        for k in list(self.keys()):
-            v = super(CaseInsensitiveDict, self).pop(k)
-            self.__setitem__(k, v)
-
-
-# TODO: initialize middlewares in Lambda context and not execution
 def wrap_handler_with_middlewares(initial_request_handler):
     chained_handler = initial_request_handler
 
@@ -149,16 +272,8 @@ def wrap_handler_with_middlewares(initial_request_handler):
 
         middleware = import_string(middleware_path)
 
-        def printme(mid, txt):
-            print(txt, str(mid))
-
-            def aux(*a, **kw):
-                return mid(*a, **kw)
-
-            return aux
-
-        middleware.__call__ = printme(middleware.__call__, 'running handler (django) middleware ')
-        wrapped_handler = printme(middleware, 'initializing ')(chained_handler)
+        logger.debug('initializing handler (django) middleware %s', middleware_path)
+        wrapped_handler = middleware(chained_handler)
 
         if wrapped_handler is None:
             raise ImproperlyConfigured(
@@ -166,13 +281,17 @@ def wrap_handler_with_middlewares(initial_request_handler):
             )
 
         chained_handler = wrapped_handler
-    print('ended wrapping handler')
+
     return chained_handler
 
 
+def no_request_hook(*_args, **_kwargs):
+    return None
+
+
 class RequestWrapper:
     def __init__(self):
-        self.initial_request_hook = lambda: None
+        self.initial_request_hook = no_request_hook
 
 
 request_wrapper = RequestWrapper()
@@ -180,138 +299,285 @@ request_wrapper = RequestWrapper()
 
 # This ensures the request_wrapper.initial_request_hook is defined after lambda executed
 def run_request_wrapper_hook(*args, **kwargs):
-    return request_wrapper.initial_request_hook(*args, **kwargs)
+    with measure('request_handler'):
+        return request_wrapper.initial_request_hook(*args, **kwargs)
 
 
+# Built once per container (Lambda init phase), shared by the AppSync and the ApiGateway handlers
 handler_with_middlewares = wrap_handler_with_middlewares(run_request_wrapper_hook)
 
 
-def execute_resolver_with_middlewares(initial_request_resolver):
-    print('starting execute_resolver_with_middlewares')
+def run_with_middlewares(request_handler, request):
+    """Runs the per-request handler at the end of the container-wide Django middleware chain.
 
-    def wrap_as_promise(resolver):
-        def promise_like_resolver(*args, **kwargs):
-            returned_promise_like = PromiseLikeHolder(is_rejected=False, reason=None, is_fulfilled=True, value=None)
+    The handler only lives in the request_wrapper slot for the duration of the request, so nothing from a previous
+    invocation is kept alive by the chain on warm containers.
+    """
+    request_wrapper.initial_request_hook = request_handler
+    try:
+        with measure('pipeline'):
+            return handler_with_middlewares(request)
+    finally:
+        request_wrapper.initial_request_hook = no_request_hook
 
-            try:
+
+def wrap_as_promise(resolver):
+    def promise_like_resolver(*args, **kwargs):
+        returned_promise_like = PromiseLikeHolder(is_rejected=False, reason=None, is_fulfilled=True, value=None)
+
+        try:
+            with measure('resolver'):
                 result = resolver(*args, **kwargs)
-            except Exception as e:
-                returned_promise_like.reason = e
-                returned_promise_like.value = e
-                returned_promise_like.is_rejected = True
-                returned_promise_like.is_fulfilled = False
-            else:
-                returned_promise_like.reason = result
-                returned_promise_like.value = result
 
-            return returned_promise_like
+                # `async def` resolvers (and mutations) run on the container's event loop
+                if inspect.isawaitable(result):
+                    result = async_support.run(result)
+        except Exception as e:
+            returned_promise_like.reason = e
+            returned_promise_like.value = e
+            returned_promise_like.is_rejected = True
+            returned_promise_like.is_fulfilled = False
+        else:
+            returned_promise_like.reason = result
+            returned_promise_like.value = result
 
-        return promise_like_resolver
+        return returned_promise_like
+
+    return promise_like_resolver
 
-    print('before wrapping as promise')
-    last_resolver = wrap_as_promise(initial_request_resolver)
-    print('after wrapping as promise')
 
-    for middleware_path in settings.GRAPHENE.get('MIDDLEWARE', []):
-        middleware = import_string(middleware_path)()
+def unwrap_from_promise(resolver):
+    def resolver_that_returns_promise(*args, **kwargs):
+        promise_like_dict = resolver(*args, **kwargs)
 
-        def wrapped_resolver(clojure_middleware, clojure_last_resolver):
-            def clojure_resolver(*args, **kwargs):
-                print('running resolver (graphene) middleware ', clojure_middleware)
-                return clojure_middleware.resolve(clojure_last_resolver, *args, **kwargs)
+        if promise_like_dict.is_rejected:
+            raise promise_like_dict.reason
 
-            return clojure_resolver
+        return promise_like_dict.value
 
-        last_resolver = wrapped_resolver(middleware, last_resolver)
-    print('after middleware loop')
+    return resolver_that_returns_promise
 
-    def unwrap_from_promise(resolver):
-        def resolver_that_returns_promise(*args, **kwargs):
-            promise_like_dict = resolver(*args, **kwargs)
 
-            if promise_like_dict.is_rejected:
-                raise promise_like_dict.reason
+def is_stateful_middleware(middleware_class):
+    """Graphene middlewares that keep per-request state declare `stateful = True` to get a new instance per request."""
+    return getattr(middleware_class, 'stateful', False)
 
-            return promise_like_dict.value
 
-        return resolver_that_returns_promise
+def wrap_with_middleware(middleware_class, last_resolver):
+    if is_stateful_middleware(middleware_class):
+        def stateful_resolver(*args, **kwargs):
+            logger.debug('running resolver (graphene) middleware %s', middleware_class)
+            return middleware_class().resolve(last_resolver, *args, **kwargs)
 
-    print('ending execute_resolver_with_middlewares')
+        return stateful_resolver
+
+    middleware = middleware_class()
+
+    def stateless_resolver(*args, **kwargs):
+        logger.debug('running resolver (graphene) middleware %s', middleware)
+        return middleware.resolve(last_resolver, *args, **kwargs)
+
+    return stateless_resolver
+
+
+def compile_resolver_with_middlewares(initial_request_resolver, middleware_paths):
+    last_resolver = wrap_as_promise(initial_request_resolver)
+
+    for middleware_path in middleware_paths:
+        last_resolver = wrap_with_middleware(import_string(middleware_path), last_resolver)
 
     return unwrap_from_promise(last_resolver)
 
 
-camel_to_snake_pattern = re.compile(r'(?<!^)(?=[A-Z])')
+def with_response_cache_lookup(resolver, response_cache: ResponseCache):
+    """Looks the response up in the cache as the innermost resolver of the graphene middleware chain.
 
+    The middlewares (e.g. permission checks) run on hits too, so a caller they refuse never gets a cached response.
+    The cache key is computed by the handler, on `info.cache_key`.
+    """
+    def cached_resolver(root, info, **arguments):
+        content = response_cache.get(info.cache_key)
+        current_metrics().count('ResponseCacheHit', int(content is not MISSING))
+        logger.debug('response cache stats %s', response_cache.stats())
 
-def camel_to_snake(name: str):
-    return camel_to_snake_pattern.sub('_', name).lower()
+        if content is not MISSING:
+            return CachedContent(content)
 
+        return resolver(root, info, **arguments)
 
-def snake_to_camel(name: str):
-    first, *others = name.split('_')
-    return ''.join([first.lower(), *map(str.title, others)])
+    return cached_resolver
 
 
-def resolve_fields(instance, type_: Optional[type], selection_set, info):
-    if instance is None:
-        return None
+# (resolver, graphene middleware paths) -> resolver wrapped by the graphene middlewares, reused on warm containers
+compiled_resolvers: Dict[tuple, Callable] = {}
 
-    return_dict = {}
 
-    for field_name in selection_set:
-        if field_name == '__typename':
-            return_dict[field_name] = type_.__name__ if type_ is not None else None
-            continue
+def execute_resolver_with_middlewares(initial_request_resolver):
+    middleware_paths = tuple(settings.GRAPHENE.get('MIDDLEWARE', []))
+    key = (initial_request_resolver, middleware_paths)
+
+    if (compiled_resolver := compiled_resolvers.get(key)) is None:
+        compiled_resolver = compile_resolver_with_middlewares(initial_request_resolver, middleware_paths)
+        compiled_resolvers[key] = compiled_resolver
+
+    return compiled_resolver
+
+
+SelectionTree = Dict[str, 'SelectionTree']
+
+
+@lru_cache(maxsize=256)
+def compile_selection_set(selection_set_list: tuple) -> SelectionTree:
+    """Compiles AppSync's flat selectionSetList into a tree, where leaves map to an empty dict.
+
+    E.g. ('id', 'author', 'author/name') becomes {'id': {}, 'author': {'name': {}}}.
+    Trees are memoized across invocations, so they must never be mutated.
+    """
+    tree = {}
+
+    for selection in selection_set_list:
+        node = tree
+        for part in selection.split('/'):
+            node = node.setdefault(part, {})
+
+    return tree
+
+
+PAGINATION_FIELDS = ('data', 'total_results', 'totalResults')
+
+
+@lru_cache(maxsize=256)
+def compile_paginated_selection_set(selection_set_list: tuple) -> SelectionTree:
+    """Same as `compile_selection_set`, with the fields under `data` lifted to the top level."""
+    tree = compile_selection_set(selection_set_list)
+
+    return {
+        **{name: sub_tree for name, sub_tree in tree.items() if name not in PAGINATION_FIELDS},
+        **tree.get('data', {}),
+    }
+
+
+def dict_key_accessor(key: str):
+    def get_dict_key(instance, _info):
+        return instance.get(key)
+
+    return get_dict_key
+
+
+def attribute_accessor(attribute: str):
+    def get_attribute(instance, _info):
+        return getattr(instance, attribute, None)
+
+    return get_attribute
+
 
-        if '/' in field_name:
+def build_field_resolver(type_: Optional[type], field_name: str, instance_class: type):
+    field_name_snake_case = camel_to_snake(field_name)
+    resolver_name = f'resolve_{field_name_snake_case}'
+
+    if (type_resolver := getattr(type_, resolver_name, None)) is not None:
+        return type_resolver
+
+    # If it's a dict, just return the value under its key
+    if issubclass(instance_class, dict):
+        return dict_key_accessor(field_name_snake_case)
+
+    # In case the type_ is actually the model and not the type, we reverse access the type and get the resolver
+    if (graphene_type := getattr(instance_class, ReverseModelTypeMeta.REVERSE_ATTR_NAME, None)) is not None:
+        if (graphene_resolver := getattr(graphene_type, resolver_name, None)) is not None:
+            return graphene_resolver
+
+    return attribute_accessor(field_name_snake_case)
+
+
+# (graphene type, field name, instance class) -> accessor for that field, planned once per container
+field_resolvers: Dict[tuple, Callable] = {}
+
+
+def get_field_resolver(type_: Optional[type], field_name: str, instance_class: type):
+    key = (type_, field_name, instance_class)
+
+    if (field_resolver := field_resolvers.get(key)) is None:
+        field_resolver = build_field_resolver(type_, field_name, instance_class)
+        field_resolvers[key] = field_resolver
+
+    return field_resolver
+
+
+def prepare_field_resolvers(type_: Optional[type]):
+    """Plans the accessors of all the fields declared on a graphene type, ahead of the first request."""
+    meta = getattr(type_, '_meta', None)
+    # DjangoObjectTypes resolve model instances, other types (e.g. mutation payloads) resolve instances of themselves
+    instance_class = getattr(meta, 'model', None) or type_
+
+    for name in getattr(meta, 'fields', None) or {}:
+        get_field_resolver(type_, snake_to_camel(name), instance_class)
+
+
+def resolve_fields(instance, type_: Optional[type], selection_set: SelectionTree, info,
+                   max_concurrency: Optional[int] = None):
+    return resolve_many([instance], type_, selection_set, info, max_concurrency)[0]
+
+
+def resolve_many(instances: List[Any], type_: Optional[type], selection_set: SelectionTree,
+                 info, max_concurrency: Optional[int] = None) -> List[Optional[Dict]]:
+    """Resolves the selection set of many instances, one level of the response at a time.
+
+    All the instances' fields are resolved before any DataLoader is dispatched, so their loads are batched, and the
+    nested fields of every instance are then resolved together as the next level. Likewise, the `async def resolve_*`
+    methods of a level are awaited together, at most `max_concurrency` at a time.
+    """
+    rows = []
+    # [(return_dict, field name, awaitable)] of the async field resolvers of this level
+    awaiting: List[tuple] = []
+
+    for instance in instances:
+        if instance is None:
+            rows.append(None)
             continue
 
-        subfield_prefix = f'{field_name}/'
-        subset = [
-            sub_selection[len(subfield_prefix):]
-            for sub_selection in selection_set
-            if sub_selection.startswith(subfield_prefix)
-        ]
+        return_dict = {}
+        instance_class = instance.__class__
 
-        field_name_snake_case = camel_to_snake(field_name)
+        for field_name in selection_set:
+            if field_name == '__typename':
+                return_dict[field_name] = type_.__name__ if type_ is not None else None
+                continue
 
-        def default_resolver(i, _):
-            # If it's a dict, just return the value under its key
-            if isinstance(i, dict):
-                return i.get(field_name_snake_case)
+            field_value = get_field_resolver(type_, field_name, instance_class)(instance, info)
+            if inspect.isawaitable(field_value):
+                awaiting.append((return_dict, field_name, field_value))
 
-            # In case the type_ is actually the model and not the type, we reverse access the type and get the resolver
-            if hasattr(i, ReverseModelTypeMeta.REVERSE_ATTR_NAME):
-                graphene_type = getattr(i, ReverseModelTypeMeta.REVERSE_ATTR_NAME)
-                if (graphene_resolver := getattr(graphene_type, f'resolve_{field_name_snake_case}', None)) is not None:
-                    return graphene_resolver(i, _)
+            return_dict[field_name] = field_value
 
-            if hasattr(i, field_name_snake_case):
-                return getattr(i, field_name_snake_case)
+        rows.append(return_dict)
 
-            return lambda _, __: None
+    if awaiting:
+        awaited_values = async_support.gather([awaitable for _, _, awaitable in awaiting], max_concurrency)
+        for (return_dict, field_name, _), field_value in zip(awaiting, awaited_values):
+            return_dict[field_name] = field_value
 
-        def serialize_value(value):
-            if isinstance(value, UUID):
-                return str(value)
+    dispatch_loaders(info.context.dataloaders)
 
-            if isinstance(value, datetime):
-                return value.strftime('%Y-%m-%dT%H:%M:%SZ')
+    # field name -> [(return_dict, child instances, whether the field is a list)]
+    children_by_field: Dict[str, List[tuple]] = {}
 
-            if isinstance(value, date):
-                return value.strftime('%Y-%m-%d')
+    for return_dict in rows:
+        if return_dict is None:
+            continue
 
-            if isinstance(value, GeneratorType):
-                return list(value)
+        for field_name, subset in selection_set.items():
+            if field_name == '__typename':
+                continue
 
-            return value
+            field_value = return_dict[field_name]
+            if isinstance(field_value, Pending):
+                field_value = field_value.get()
 
-        field_value = getattr(type_, f'resolve_{field_name_snake_case}', default_resolver)(instance, info)
+            if len(subset) == 0:
+                return_dict[field_name] = serialize_value(field_value)
+                continue
 
-        if len(subset) == 0:
-            return_dict[field_name] = serialize_value(field_value)
-        else:
             if field_value is None:
                 return_dict[field_name] = None
                 continue
@@ -319,183 +585,410 @@ def resolve_fields(instance, type_: Optional[type], selection_set, info):
             if field_value.__class__.__name__ in ('RelatedManager', 'ManyRelatedManager'):
                 field_value = field_value.all()
 
-            # TODO: get child type somewhere
-            child_type = None
             if field_value.__class__.__name__ in ('ManyRelatedManager', 'QuerySet', 'list'):
-                return_dict[field_name] = [
-                    resolve_fields(child, child_type, subset, info)
-                    for child in field_value
-                ]
+                children_by_field.setdefault(field_name, []).append((return_dict, list(field_value), True))
             else:
-                return_dict[field_name] = resolve_fields(field_value, child_type, subset, info)
+                children_by_field.setdefault(field_name, []).append((return_dict, [field_value], False))
+
+    for field_name, children in children_by_field.items():
+        # TODO: get child type somewhere
+        child_type = None
+        child_rows = resolve_many(
+            [child for _, field_children, _ in children for child in field_children],
+            child_type, selection_set[field_name], info, max_concurrency,
+        )
 
-    return return_dict
+        position = 0
+        for return_dict, field_children, is_many in children:
+            next_position = position + len(field_children)
+            return_dict[field_name] = child_rows[position:next_position] if is_many else child_rows[position]
+            position = next_position
 
+    return rows
 
-def return_none_if_is_warmup(f):
-    def wrapped_lambda(event, _context):
-        if event.get('is_test_payload_to_warm_lambda', False):
-            print('is a lambda warmer event, returning None')
-            return None
 
-        print('not a warmer event, running lambda')
-        return f(event, _context)
+def chunks_of(iterable, chunk_size: Optional[int]):
+    if chunk_size is None:
+        yield list(iterable)
+        return
 
-    return wrapped_lambda
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
 
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
 
-def apigateway_to_wsgi(resolver):
+    if chunk:
+        yield chunk
+
+
+class ResultTooLargeError(Exception):
+    pass
+
+
+def iterate_in_chunks(queryset: QuerySet, chunk_size: int):
+    lookups = queryset._prefetch_related_lookups
+    if not lookups:
+        yield from queryset.iterator(chunk_size=chunk_size)
+        return
+
+    for chunk in chunks_of(queryset.prefetch_related(None).iterator(chunk_size=chunk_size), chunk_size):
+        prefetch_related_objects(chunk, *lookups)
+        yield from chunk
+
+
+def iterate_result(result, chunk_size: Optional[int] = None, max_results: Optional[int] = None):
+    """Iterates a list result, streaming QuerySets in chunks and failing fast when there are too many results.
+
+    With a `chunk_size`, QuerySets are read through `.iterator()` (a server-side cursor on Postgres), so only one chunk
+    of model instances is alive at a time instead of the whole result cache. Their prefetch_related lookups are done
+    per chunk, `.iterator()` ignores them before Django 4.1.
+    """
+    if isinstance(result, QuerySet) and result._result_cache is None:
+        if max_results is not None:
+            # One extra row is enough to know the limit was exceeded, without fetching the whole table
+            result = result[:max_results + 1]
+
+        if chunk_size is not None:
+            result = iterate_in_chunks(result, chunk_size)
+
+    for count, instance in enumerate(result, start=1):
+        if max_results is not None and count > max_results:
+            raise ResultTooLargeError(f'Result has more than the maximum of {max_results} items')
+
+        yield instance
+
+
+def prime_if_is_warmup(primer: Primer):
+    def decorator(f):
+        def wrapped_lambda(event, _context):
+            start_invocation(_context)
+
+            # AppSync BatchInvoke events are lists, which are never warmer events
+            if isinstance(event, dict) and event.get('is_test_payload_to_warm_lambda', False):
+                logger.debug('is a lambda warmer event, priming the container')
+                # The container's cold start was this warmer event, not the next real request
+                metrics_state.is_cold_start = False
+                return primer.prime(f, _context, hold_ms=event.get('hold_ms', 0))
+
+            return f(event, _context)
+
+        return wrapped_lambda
+
+    return decorator
+
+
+def build_apigateway_request(event: Dict):
+    if (query_parameters := event.get('multiValueQueryStringParameters')) is None:
+        query_parameters = {key: [value] for key, value in (event.get('queryStringParameters') or {}).items()}
+
+    return RequestHolder(
+        headers=HeaderMap(event.get('headers')),
+        method=event.get('httpMethod', 'POST'),
+        path=event.get('path', ''),
+        raw_body=event.get('body'),
+        is_base64_encoded=event.get('isBase64Encoded', False),
+        query_parameters=query_parameters,
+    )
+
+
+def apigateway_to_wsgi(resolver, compression_min_size: Optional[int] = None,
+                       priming_events: Optional[List[Dict]] = None, priming_hook: Optional[str] = None):
     # TODO: move this to a new file `apigateway_to_wsgi.py`
-    @return_none_if_is_warmup
+    @prime_if_is_warmup(Primer(priming_events, priming_hook))
+    @with_invocation_metrics
+    @with_connection_keeper
     def apigateway_handler(event, _context):
-        event_headers = CaseInsensitiveDict(event.get('headers', {}))
-        event_path = event.get('path', '')
-        event_info = event.get('info', {})
-        event_body = event.get('body', '')
-        event_params = event.get('pathParameters', {})
-        if event_params is None:
-            event_params = {}
-        event_method = event.get('httpMethod', 'POST')
-        content_type_header = event_headers.get('Content-Type', '')
-
-        fs: Optional[FieldStorage] = None
-        if content_type_header.startswith('multipart/'):
-            raw_body = base64.b64decode(event_body)
-            # body = raw_body.decode('iso-8859-1')
-            fs = FieldStorage(fp=io.BytesIO(raw_body), headers=event_headers,
-                              environ={'REQUEST_METHOD': event_method, 'CONTENT_TYPE': content_type_header, })['file']
-
-        wsgi_request = RequestHolder(
-            user=None,
-            headers=event_headers,
-            META=event_headers,
-            FILES={} if fs is None else {'file': fs},
-            method=event_method,
-            body=str(event_info),
-            path=event_path,
-            path_info=event_path,
-            _get_raw_host=lambda: f'{event_headers["host"]}:{event_headers["x-forwarded-port"]}',
-            get_full_path=lambda: event_path,
-        )
+        with measure('parse'):
+            wsgi_request = build_apigateway_request(event)
+            event_params = event.get('pathParameters', {})
+            if event_params is None:
+                event_params = {}
 
         def request_handler(request):
-            result = resolver(request, **event_params)
+            with measure('resolver'):
+                result = resolver(request, **event_params)
+
+                if inspect.isawaitable(result):
+                    result = async_support.run(result)
 
-            if isinstance(result, JsonResponse):
-                result = {
-                    'statusCode': 200,
-                    'body': '{}',
-                    **json.loads(result.content)
-                }
+            # Django responses go through the middlewares as they are, and are adapted once they are done
+            if isinstance(result, HttpResponseBase):
+                return result
 
-            response_holder_content: Any
+            # Views can also return the Lambda proxy response itself
+            if isinstance(result, dict) and not isinstance(result.get('body', ''), str):
+                with measure('serialization'):
+                    result['body'] = dumps(result['body'])
 
             response_holder_object = ResponseHolder(result)
-            response_holder_object._headers = event_headers
+            response_holder_object._headers = request.headers
 
             return response_holder_object
 
-        response_holder: ResponseHolder = wrap_handler_with_middlewares(request_handler)(wsgi_request)
-        return response_holder.content
+        try:
+            response = run_with_middlewares(request_handler, wsgi_request)
+        finally:
+            wsgi_request.close()
+
+        with measure('serialization'):
+            if isinstance(response, ResponseHolder):
+                apigateway_response = response.content
+            else:
+                apigateway_response = to_apigateway_response(response)
+
+            if isinstance(apigateway_response, dict):
+                apigateway_response = compress_response(apigateway_response,
+                                                        wsgi_request.headers.get('Accept-Encoding'),
+                                                        compression_min_size)
+
+        return apigateway_response
 
     return apigateway_handler
 
 
-def appsync_to_wsgi_of(graphene_type, is_list=False, is_paginated=False, input_type=None):
+def parse_arguments(raw_arguments: Dict, input_type=None):
+    arguments = {
+        camel_to_snake(key): raw_arguments[key]
+        for key in raw_arguments
+    }
+
+    if 'input' in arguments:
+        input_dict = arguments['input']
+        snake_case_input_dict = {camel_to_snake(key): value for key, value in input_dict.items()}
+
+        arguments['input'] = AttrDict(**snake_case_input_dict)
+        if input_type is not None:
+            if hasattr(input_type, 'model'):
+                AttrDict.model = input_type.model
+                AttrDict.fields = input_type.fields
+                AttrDict.to_model = graphene_extender.classes.InputFactory.to_model
+
+            for input_field_name, raw_value in snake_case_input_dict.items():
+                if raw_value is None:
+                    continue
+
+                if isinstance(getattr(input_type, input_field_name), graphene.types.Date):
+                    arguments['input'][input_field_name] = datetime.strptime(raw_value, '%Y-%m-%d').date()
+
+    return arguments
+
+
+def arguments_key(raw_arguments: Dict):
+    return json.dumps(raw_arguments, sort_keys=True, default=str)
+
+
+def build_appsync_request(event: Dict):
+    # AppSync events carry the request headers only, the GraphQL arguments are parsed from the event
+    return AppSyncRequestHolder(
+        headers=HeaderMap(event.get('request', {}).get('headers')),
+        event_info=event.get('info', {}),
+    )
+
+
+def build_resolve_info(request, event_info: Dict):
+    field_name = event_info.get('fieldName')
+
+    return ResolveInfoHolder(
+        path=[field_name],
+        context=request,
+        field_name=field_name,
+        operation=OperationDefinitionHolder(
+            operation=event_info.get('parentTypeName', '').lower(),
+            selection_set=SelectionSetHolder(selections=[])
+        ),
+    )
+
+
+class BatchResultMismatchError(Exception):
+    pass
+
+
+def batch_resolver(resolver):
+    """Marks a resolver of AppSync BatchInvoke events, see `ResolverConfig.batch_size`.
+
+    It gets the list of sources of the batch as `root`, instead of a single one, and returns one result per source in
+    the same order:
+
+        @batch_resolver
+        def resolver(root, info):
+            books = Book.objects.in_bulk([source['book_id'] for source in root])
+            return [books.get(source['book_id']) for source in root]
+    """
+    resolver.is_batch_resolver = True
+    return resolver
+
+
+def appsync_to_wsgi_of(graphene_type, is_list=False, is_paginated=False, input_type=None, optimize_queries=True,
+                       prune_columns=True, stream_chunk_size=None, max_results=None,
+                       cache_ttl=None, cache_max_bytes=8 * 1024 * 1024, cache_identity=None, max_concurrency=10,
+                       priming_events=None, priming_hook=None, batch=False):
+    # Shared by the warm invocations of this container, BatchInvoke events aren't cached
+    response_cache = None if cache_ttl is None else ResponseCache(cache_ttl, cache_max_bytes)
+
+    def serialize_result(result, selection_set_list: tuple, info):
+        if is_list:
+            selection_set = compile_selection_set(selection_set_list)
+            if optimize_queries:
+                result = optimize_result(result, selection_set, graphene_type, prune_columns)
+
+            return [
+                row
+                for chunk in chunks_of(iterate_result(result, stream_chunk_size, max_results), stream_chunk_size)
+                for row in resolve_many(chunk, graphene_type, selection_set, info, max_concurrency)
+            ]
+
+        if is_paginated:
+            selection_set = compile_paginated_selection_set(selection_set_list)
+            result_data = result.data
+            if optimize_queries:
+                result_data = optimize_result(result_data, selection_set, graphene_type, prune_columns)
+
+            data = [
+                row
+                for chunk in chunks_of(iterate_result(result_data, stream_chunk_size, max_results), stream_chunk_size)
+                for row in resolve_many(chunk, graphene_type, selection_set, info, max_concurrency)
+            ]
+            return {'data': data, 'totalResults': result.total_results}
+
+        selection_set = compile_selection_set(selection_set_list)
+        if optimize_queries:
+            result = optimize_result(result, selection_set, graphene_type, prune_columns)
+
+        return resolve_fields(result, graphene_type, selection_set, info, max_concurrency)
+
     def appsync_to_wsgi(resolver):
-        @return_none_if_is_warmup
-        def appsync_handler(event, _context):
-            print('starting appsync handler')
-            event_headers = event.get('request', {}).get('headers', {})
-            event_info = event.get('info', {})
-
-            wsgi_request = RequestHolder(
-                user=None,
-                headers=event_headers,
-                META=event_headers,
-                method='POST',
-                body=str(event_info),
-                path='/graphql',
-                path_info='/graphql',
-                _get_raw_host=lambda: f'{event_headers["host"]}:{event_headers["x-forwarded-port"]}',
-                get_full_path=lambda: '/graphql',
+        # Batch resolvers take a list as `root`, so both sides have to opt in
+        if getattr(resolver, 'is_batch_resolver', False) != batch:
+            raise ImproperlyConfigured(
+                f'{resolver.__name__} gets BatchInvoke events (ResolverConfig.batch_size), decorate it with '
+                f'@batch_resolver' if batch else
+                f'{resolver.__name__} is a @batch_resolver, set ResolverConfig.batch_size to get BatchInvoke events'
             )
 
-            field_name = event_info.get('fieldName')
+        # BatchInvoke events aren't cached, they resolve `resolver` directly
+        cached_resolver = resolver if response_cache is None else with_response_cache_lookup(resolver, response_cache)
+
+        def batch_handler(events: List[Dict]):
+            """Resolves an AppSync BatchInvoke, where each event holds the `source` of one parent object.
+
+            Events with the same arguments are resolved together: the resolver gets the list of sources as `root` and
+            returns one result per source, in the same order, so it can look them all up at once (e.g. `pk__in`).
+            """
+            event_info = events[0].get('info', {})
+            selection_set_list = tuple(event_info.get('selectionSetList', []))
+
+            indexes_by_arguments: Dict[str, List[int]] = {}
+            for index, batch_event in enumerate(events):
+                indexes_by_arguments.setdefault(arguments_key(batch_event.get('arguments', {})), []).append(index)
+
+            def request_handler(request):
+                info = build_resolve_info(request, event_info)
+                compiled_resolver = execute_resolver_with_middlewares(resolver)
+                results = [None] * len(events)
+
+                for indexes in indexes_by_arguments.values():
+                    with measure('parse'):
+                        arguments = parse_arguments(events[indexes[0]].get('arguments', {}), input_type)
+                        sources = [events[index].get('source') for index in indexes]
+
+                    with measure('resolver_chain'):
+                        group_results = list(compiled_resolver(sources, info, **arguments))
+                    if len(group_results) != len(sources):
+                        raise BatchResultMismatchError(
+                            f'Batch resolver returned {len(group_results)} results for {len(sources)} sources'
+                        )
+
+                    for index, group_result in zip(indexes, group_results):
+                        results[index] = group_result
+
+                with measure('serialization'):
+                    if is_list or is_paginated:
+                        content = [serialize_result(result, selection_set_list, info) for result in results]
+                    else:
+                        # Single objects of the whole batch share their related lookups and their DataLoader batches
+                        selection_set = compile_selection_set(selection_set_list)
+                        if optimize_queries:
+                            optimize_result([result for result in results if result is not None], selection_set,
+                                            graphene_type, prune_columns)
+
+                        content = resolve_many(results, graphene_type, selection_set, info, max_concurrency)
+
+                response_holder_object = ResponseHolder(content)
+                response_holder_object._headers = request.headers
+
+                return response_holder_object
+
+            with measure('parse'):
+                wsgi_request = build_appsync_request(events[0])
+
+            response_holder: ResponseHolder = run_with_middlewares(request_handler, wsgi_request)
+            return response_holder.content
 
-            root = None if event_info.get('parentTypeName').lower() in ['query', 'mutation'] else True
-            arguments = event.get('arguments', {})
-            arguments = {
-                camel_to_snake(key): arguments[key]
-                for key in arguments
-            }
+        @prime_if_is_warmup(Primer(priming_events, priming_hook))
+        @with_invocation_metrics
+        @with_connection_keeper
+        def appsync_handler(event, _context):
+            logger.debug('starting appsync handler for %s', graphene_type)
+
+            if isinstance(event, list):
+                if not batch:
+                    raise ImproperlyConfigured('BatchInvoke event for a resolver without ResolverConfig.batch_size')
 
-            if 'input' in arguments:
-                input_dict = arguments['input']
-                snake_case_input_dict = {camel_to_snake(key): value for key, value in input_dict.items()}
+                return batch_handler(event)
 
-                arguments['input'] = AttrDict(**snake_case_input_dict)
-                if input_type is not None:
-                    if hasattr(input_type, 'model'):
-                        AttrDict.model = input_type.model
-                        AttrDict.fields = input_type.fields
-                        AttrDict.to_model = graphene_extender.classes.InputFactory.to_model
+            if batch:
+                # Invoked with a single event (e.g. a priming event), resolved as a batch of one
+                return batch_handler([event])[0]
 
-                    for input_field_name, raw_value in snake_case_input_dict.items():
-                        if raw_value is None:
-                            continue
+            with measure('parse'):
+                event_headers = event.get('request', {}).get('headers', {})
+                event_info = event.get('info', {})
 
-                        if isinstance(getattr(input_type, input_field_name), graphene.types.Date):
-                            arguments['input'][input_field_name] = datetime.strptime(raw_value, '%Y-%m-%d').date()
+                root = None if event_info.get('parentTypeName').lower() in ['query', 'mutation'] else True
+                arguments = parse_arguments(event.get('arguments', {}), input_type)
+                wsgi_request = build_appsync_request(event)
 
             def request_handler(request):
-                print('starting appsync request handler')
-                selection_set_fields = event_info.get('selectionSetList', [])
-                info = ResolveInfoHolder(
-                    path=[field_name],
-                    context=request,
-                    field_name=field_name,
-                    operation=OperationDefinitionHolder(
-                        operation=event_info.get('parentTypeName', '').lower(),
-                        selection_set=SelectionSetHolder(selections=[])
-                    ),
-                )
-
-                result = execute_resolver_with_middlewares(resolver)(root, info, **arguments)
-
-                response_holder_content: Any
-
-                if is_list:
-                    response_holder_content = [
-                        resolve_fields(instance, graphene_type, selection_set_fields, info)
-                        for instance in result
-                    ]
-
-                elif is_paginated:
-                    selection_set_fields = [
-                        selection_field.replace('data/', '') if selection_field.startswith('data/') else selection_field
-                        for selection_field in selection_set_fields
-                        if selection_field not in ['data', 'total_results', 'totalResults']
-                    ]
-                    data = [
-                        resolve_fields(instance, graphene_type, selection_set_fields, info)
-                        for instance in result.data
-                    ]
-                    response_holder_content = {'data': data, 'totalResults': result.total_results}
+                selection_set_list = tuple(event_info.get('selectionSetList', []))
+                info = build_resolve_info(request, event_info)
+
+                # Keyed after the Django middlewares, so authentication still runs and the user is known. The lookup
+                # itself happens inside the graphene middlewares, see `with_response_cache_lookup`
+                if response_cache is not None:
+                    info.cache_key = response_cache_key(event, selection_set_list,
+                                                        identity_of(request, cache_identity))
 
+                with measure('resolver_chain'):
+                    result = execute_resolver_with_middlewares(cached_resolver)(root, info, **arguments)
+
+                if isinstance(result, CachedContent):
+                    content = result.content
                 else:
-                    response_holder_content = resolve_fields(result, graphene_type, selection_set_fields, info)
+                    with measure('serialization'):
+                        content = serialize_result(result, selection_set_list, info)
+
+                    if response_cache is not None:
+                        response_cache.set(info.cache_key, content)
 
-                response_holder_object = ResponseHolder(response_holder_content)
+                response_holder_object = ResponseHolder(content)
                 response_holder_object._headers = event_headers
 
                 return response_holder_object
 
-            print('sending response through pipeline')
-            request_wrapper.initial_request_hook = request_handler
-            response_holder: ResponseHolder = handler_with_middlewares(wsgi_request)
+            response_holder: ResponseHolder = run_with_middlewares(request_handler, wsgi_request)
             return response_holder.content
 
+        def prepare():
+            """Builds the graphene middleware chain and the field plans, called from the Lambda init phase."""
+            execute_resolver_with_middlewares(cached_resolver)
+            prepare_field_resolvers(graphene_type)
+
+        appsync_handler.prepare = prepare
+        # Exposed so the hit/miss counters can be read with `resolver.response_cache.stats()`
+        appsync_handler.response_cache = response_cache
         return appsync_handler
 
     return appsync_to_wsgi
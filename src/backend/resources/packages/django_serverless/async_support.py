@@ -0,0 +1,52 @@
+import asyncio
+from typing import Any, Awaitable, Callable, List, Optional
+
+from asgiref.sync import async_to_sync
+from asgiref.sync import sync_to_async as asgiref_sync_to_async
+
+
+async def await_value(awaitable: Awaitable):
+    return await awaitable
+
+
+def run(awaitable: Awaitable):
+    """Runs an awaitable to completion from the (synchronous) handler.
+
+    Goes through `async_to_sync`: the loop runs in a worker thread while the handler's thread serves the
+    `sync_to_async` calls, so the ORM keeps using the handler's DB connection, its transaction and its query metrics.
+    """
+    return async_to_sync(await_value)(awaitable)
+
+
+async def gather_limited(awaitables: List[Awaitable], max_concurrency: Optional[int]) -> List[Any]:
+    if max_concurrency is None:
+        return await asyncio.gather(*awaitables)
+
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def limited(awaitable: Awaitable):
+        async with semaphore:
+            return await awaitable
+
+    return await asyncio.gather(*(limited(awaitable) for awaitable in awaitables))
+
+
+def gather(awaitables: List[Awaitable], max_concurrency: Optional[int] = None) -> List[Any]:
+    """Awaits all the awaitables concurrently, at most `max_concurrency` at a time, and returns their results in order."""
+    return run(gather_limited(awaitables, max_concurrency))
+
+
+def sync_to_async(function: Callable) -> Callable:
+    """Makes a synchronous function, e.g. one using the Django ORM, awaitable from `async def` resolvers.
+
+    The ORM can't be called from the loop directly (Django raises `SynchronousOnlyOperation`). Wrapped calls run one at
+    a time in the handler's thread (see `run`), on its DB connection:
+
+        @sync_to_async
+        def get_owner(owner_id):
+            return User.objects.get(pk=owner_id)
+
+        async def resolve_owner(parent, info):
+            return await get_owner(parent.owner_id)
+    """
+    return asgiref_sync_to_async(function, thread_sensitive=True)
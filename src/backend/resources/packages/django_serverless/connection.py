@@ -0,0 +1,89 @@
+import os
+from functools import wraps
+from time import time
+from typing import Optional
+
+from django.db import connection, connections
+
+from django_serverless.logger import logger
+
+# Seconds without invocations after which the connection is checked before it's used, the sandbox may have been frozen
+IDLE_THRESHOLD = float(os.environ.get('DJANGO_SERVERLESS_CONNECTION_IDLE_THRESHOLD', 30))
+
+# libpq TCP keepalives, so a connection dropped while the sandbox was frozen fails fast instead of hanging
+KEEPALIVE_OPTIONS = {
+    'keepalives': 1,
+    'keepalives_idle': 30,  # Seconds idle before the first probe
+    'keepalives_interval': 5,  # Seconds between probes
+    'keepalives_count': 3,  # Unanswered probes before the connection is dropped
+}
+
+
+def configure_conn_max_age(conn_max_age: Optional[int]):
+    """Sets `CONN_MAX_AGE` on every database, which is where Django reads it (not from the top level settings)."""
+    for settings_dict in connections.databases.values():
+        settings_dict['CONN_MAX_AGE'] = conn_max_age
+
+
+def configure_keepalives():
+    """Adds the TCP keepalive `OPTIONS` to the PostgreSQL databases, the ones set in the Django settings take precedence."""
+    # The settings the connections will be created from, creating them here would import the DB backends
+    for settings_dict in connections.databases.values():
+        if settings_dict.get('ENGINE', '').endswith(('postgresql', 'postgresql_psycopg2', 'postgis')):
+            settings_dict['OPTIONS'] = {**KEEPALIVE_OPTIONS, **settings_dict.get('OPTIONS', {})}
+
+
+class ConnectionKeeper:
+    """Keeps the container's DB connection usable across invocations, however long the sandbox was frozen.
+
+    The connection is opened in the init phase with a `SELECT 1`. Before an invocation it's only checked when the
+    sandbox has been idle for more than `idle_threshold` seconds, and re-opened if the server dropped it meanwhile, so
+    a stale connection doesn't fail the request.
+    """
+
+    def __init__(self, idle_threshold: float = IDLE_THRESHOLD):
+        self.idle_threshold = idle_threshold
+        self.last_used_at: Optional[float] = None
+
+    def open(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+
+        # A keeper cycle must leave the connection open, otherwise every invocation reconnects
+        self.after_invocation()
+        if connection.connection is None:
+            logger.warning('DB connection is closed after every invocation, CONN_MAX_AGE is %s',
+                           connection.settings_dict.get('CONN_MAX_AGE'))
+
+    def refresh(self):
+        """Checks the connection (when there's one) and re-opens it if it's not usable anymore."""
+        if connection.connection is not None and not connection.is_usable():
+            logger.info('DB connection is stale, reconnecting')
+            connection.close()
+            connection.ensure_connection()
+
+        self.last_used_at = time()
+
+    def before_invocation(self):
+        if self.last_used_at is None or time() - self.last_used_at > self.idle_threshold:
+            self.refresh()
+
+    def after_invocation(self):
+        # A connection broken by the invocation is closed now, instead of failing the next one (see CONN_MAX_AGE)
+        connection.close_if_unusable_or_obsolete()
+        self.last_used_at = time()
+
+
+connection_keeper = ConnectionKeeper()
+
+
+def with_connection_keeper(f):
+    @wraps(f)
+    def kept_lambda(event, _context):
+        connection_keeper.before_invocation()
+        try:
+            return f(event, _context)
+        finally:
+            connection_keeper.after_invocation()
+
+    return kept_lambda
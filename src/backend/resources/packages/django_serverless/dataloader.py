@@ -0,0 +1,103 @@
+from typing import Any, Dict, Hashable, List, Optional
+
+
+class Pending:
+    """Placeholder returned by `DataLoader.load`, replaced by the loaded value once the loader is dispatched."""
+    __slots__ = ('loader', 'key')
+
+    def __init__(self, loader: 'DataLoader', key: Hashable):
+        self.loader = loader
+        self.key = key
+
+    def get(self):
+        if self.key not in self.loader.results:
+            self.loader.dispatch()
+
+        return self.loader.results[self.key]
+
+
+class PendingMany(Pending):
+    """Placeholder returned by `DataLoader.load_many`, replaced by the list of loaded values."""
+    __slots__ = ()
+
+    def get(self):
+        if any(key not in self.loader.results for key in self.key):
+            self.loader.dispatch()
+
+        return [self.loader.results[key] for key in self.key]
+
+
+class DataLoader:
+    """Batches the loads issued by `resolve_*` methods while `resolve_fields` walks one level of the response.
+
+    Keys are deduplicated and all loaded with a single `batch_load` call before the next level is resolved. Results are
+    memoized for the rest of the invocation. Use one instance per invocation, through `of(info)`:
+
+        class OwnerLoader(ModelLoader):
+            model = User
+
+        class PostType(DjangoObjectType):
+            def resolve_owner(parent, info):
+                return OwnerLoader.of(info).load(parent.owner_id)
+    """
+
+    def __init__(self):
+        self.results: Dict[Hashable, Any] = {}
+        self.queue: Dict[Hashable, None] = {}  # dict as an insertion ordered set
+
+    @classmethod
+    def of(cls, info) -> 'DataLoader':
+        loaders = info.context.dataloaders
+
+        if (loader := loaders.get(cls)) is None:
+            loader = loaders[cls] = cls()
+
+        return loader
+
+    def batch_load(self, keys: List[Hashable]) -> List[Any]:
+        """Returns one value per key, in the same order as the keys."""
+        raise NotImplementedError
+
+    def load(self, key: Hashable) -> Pending:
+        if key not in self.results:
+            self.queue[key] = None
+
+        return Pending(self, key)
+
+    def load_many(self, keys: List[Hashable]) -> PendingMany:
+        for key in keys:
+            if key not in self.results:
+                self.queue[key] = None
+
+        return PendingMany(self, tuple(keys))
+
+    def dispatch(self):
+        if not self.queue:
+            return
+
+        keys = list(self.queue)
+        self.queue.clear()
+
+        values = self.batch_load(keys)
+        if len(values) != len(keys):
+            raise ValueError(f'{self.__class__.__name__}.batch_load returned {len(values)} values for {len(keys)} keys')
+
+        self.results.update(zip(keys, values))
+
+
+class ModelLoader(DataLoader):
+    """Loads model instances by a unique field, the primary key by default, with a single `__in` query per batch."""
+    model = None
+    field_name: str = 'pk'
+
+    def get_queryset(self):
+        return self.model._default_manager.all()
+
+    def batch_load(self, keys: List[Hashable]) -> List[Optional[Any]]:
+        instances = self.get_queryset().in_bulk(keys, field_name=self.field_name)
+        return [instances.get(key) for key in keys]
+
+
+def dispatch_loaders(loaders: Dict[type, DataLoader]):
+    for loader in list(loaders.values()):
+        loader.dispatch()
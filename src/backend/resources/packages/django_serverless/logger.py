@@ -0,0 +1,76 @@
+import json
+import logging
+import os
+import random
+import sys
+from datetime import datetime, timezone
+
+# Set on each Lambda by the LambdasStack, derived from `is_debug_env()`
+LOG_LEVEL = os.environ.get('DJANGO_SERVERLESS_LOG_LEVEL', 'INFO')
+# Share of invocations that log at DEBUG level regardless of LOG_LEVEL
+LOG_SAMPLE_RATE = float(os.environ.get('DJANGO_SERVERLESS_LOG_SAMPLE_RATE', '0'))
+
+
+class InvocationContext:
+    def __init__(self):
+        self.request_id = None
+        self.is_sampled = False
+
+
+invocation_context = InvocationContext()
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats each record as a single JSON line, so CloudWatch Logs Insights can query its fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'timestamp': datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'request_id': invocation_context.request_id,
+        }
+
+        if invocation_context.is_sampled:
+            entry['sampled'] = True
+
+        # Structured fields are passed as `logger.info('...', extra={'fields': {...}})`
+        if (fields := getattr(record, 'fields', None)) is not None:
+            entry.update(fields)
+
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+
+        return json.dumps(entry, default=str)
+
+
+def build_logger(name: str, level: str) -> logging.Logger:
+    new_logger = logging.getLogger(name)
+    new_logger.setLevel(level)
+    # The Lambda runtime adds its own plain text handler to the root logger
+    new_logger.propagate = False
+
+    if not new_logger.handlers:
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(JsonFormatter())
+        new_logger.addHandler(handler)
+
+    return new_logger
+
+
+logger = build_logger('django_serverless', LOG_LEVEL)
+base_level = logger.level
+
+
+def start_invocation(context):
+    """Tags the following log lines with the request id and decides whether this invocation is sampled.
+
+    Sampled invocations log at DEBUG, the others at the configured level, where disabled calls cost a level check.
+    """
+    invocation_context.request_id = getattr(context, 'aws_request_id', None)
+    invocation_context.is_sampled = LOG_SAMPLE_RATE > 0 and random.random() < LOG_SAMPLE_RATE
+
+    level = logging.DEBUG if invocation_context.is_sampled else base_level
+    if logger.level != level:
+        logger.setLevel(level)
@@ -0,0 +1,133 @@
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+from functools import wraps
+from time import perf_counter
+from typing import Dict, Optional
+
+from django.db import connection
+
+NAMESPACE = os.environ.get('DJANGO_SERVERLESS_METRICS_NAMESPACE', 'DjangoServerless')
+
+# Phase name -> metric name, the phases are timed by the handlers with `measure`
+PHASE_METRICS = {
+    'parse': 'ParseTime',
+    'django_middleware': 'DjangoMiddlewareTime',
+    'graphene_middleware': 'GrapheneMiddlewareTime',
+    'resolver': 'ResolverTime',
+    'serialization': 'SerializationTime',
+}
+
+
+class InvocationMetrics:
+    """Phase timings and DB usage of one invocation, emitted as a single CloudWatch Embedded Metric Format line."""
+
+    def __init__(self, resolver_name: Optional[str], is_cold_start: bool):
+        self.resolver_name = resolver_name
+        self.is_cold_start = is_cold_start
+        self.started_at = perf_counter()
+        self.timings: Dict[str, float] = {}  # phase name -> milliseconds
+        self.counters: Dict[str, int] = {}
+        self.db_queries = 0
+        self.db_time = 0.0
+
+    @contextmanager
+    def measure(self, phase: str):
+        started_at = perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[phase] = self.timings.get(phase, 0.0) + (perf_counter() - started_at) * 1000
+
+    def count(self, name: str, value: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def db_wrapper(self, execute, sql, params, many, context):
+        """Installed with `connection.execute_wrapper`, so every query of the invocation is counted and timed."""
+        started_at = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += (perf_counter() - started_at) * 1000
+            self.db_queries += 1
+
+    def phase_timings(self) -> Dict[str, float]:
+        timings = dict(self.timings)
+
+        # Middleware chains are timed as a whole, what's left after the inner phases is the middlewares' own time
+        if 'pipeline' in timings:
+            timings['django_middleware'] = timings.pop('pipeline') - timings.pop('request_handler', 0.0)
+        if 'resolver_chain' in timings:
+            timings['graphene_middleware'] = timings.pop('resolver_chain') - timings.get('resolver', 0.0)
+
+        return timings
+
+    def to_emf(self) -> Dict:
+        values = {
+            PHASE_METRICS[phase]: round(timing, 3)
+            for phase, timing in self.phase_timings().items()
+            if phase in PHASE_METRICS
+        }
+        values['DbTime'] = round(self.db_time, 3)
+        values['TotalTime'] = round((perf_counter() - self.started_at) * 1000, 3)
+
+        counts = {**self.counters, 'DbQueries': self.db_queries, 'ColdStart': int(self.is_cold_start)}
+
+        return {
+            '_aws': {
+                'Timestamp': int(time.time() * 1000),
+                'CloudWatchMetrics': [{
+                    'Namespace': NAMESPACE,
+                    # A null dimension value is invalid EMF, without a resolver name the metrics aren't dimensioned
+                    'Dimensions': [['Resolver']] if self.resolver_name is not None else [[]],
+                    'Metrics': [
+                        *({'Name': name, 'Unit': 'Milliseconds'} for name in values),
+                        *({'Name': name, 'Unit': 'Count'} for name in counts),
+                    ],
+                }],
+            },
+            **({'Resolver': self.resolver_name} if self.resolver_name is not None else {}),
+            **values,
+            **counts,
+        }
+
+    def emit(self):
+        # Written as is: the EMF line must not be wrapped by the JSON logger
+        sys.stdout.write(json.dumps(self.to_emf()) + '\n')
+
+
+class MetricsState:
+    def __init__(self):
+        self.is_cold_start = True
+        self.current = InvocationMetrics(None, is_cold_start=True)
+
+
+metrics_state = MetricsState()
+
+
+def current_metrics() -> InvocationMetrics:
+    return metrics_state.current
+
+
+def measure(phase: str):
+    return metrics_state.current.measure(phase)
+
+
+def with_invocation_metrics(f):
+    """Times the invocation and counts its DB queries, then emits them. The resolver name is the Lambda function name."""
+    @wraps(f)
+    def measured_lambda(event, _context):
+        resolver_name = getattr(_context, 'function_name', None) or os.environ.get('AWS_LAMBDA_FUNCTION_NAME')
+        metrics = InvocationMetrics(resolver_name, metrics_state.is_cold_start)
+        metrics_state.current = metrics
+        metrics_state.is_cold_start = False
+
+        try:
+            with connection.execute_wrapper(metrics.db_wrapper):
+                return f(event, _context)
+        finally:
+            metrics.emit()
+
+    return measured_lambda
@@ -0,0 +1,64 @@
+import base64
+import io
+from typing import Tuple
+
+from django.conf import settings
+from django.core.files.uploadhandler import load_handler
+from django.http import QueryDict
+from django.http.multipartparser import MultiPartParser
+from django.utils.datastructures import MultiValueDict
+
+
+class Base64Stream:
+    """File-like view of base64 encoded text, decoded a chunk at a time as it's read.
+
+    Only the chunk being read is decoded, so the decoded body is never held in memory as a whole. The text must not
+    contain line breaks, which is the case for API Gateway bodies.
+    """
+
+    def __init__(self, encoded: str):
+        self.encoded = encoded
+        self.position = 0  # in the encoded text
+        self.pending = b''  # decoded but not read yet
+
+    def __len__(self):
+        """Length of the decoded content."""
+        return len(self.encoded) // 4 * 3 - self.encoded[-2:].count('=')
+
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0:
+            data = self.pending + base64.b64decode(self.encoded[self.position:])
+            self.position = len(self.encoded)
+            self.pending = b''
+            return data
+
+        if (missing := size - len(self.pending)) > 0:
+            # 4 base64 characters decode to 3 bytes, chunks are aligned to that so they can be decoded on their own
+            encoded_chunk = self.encoded[self.position:self.position + (missing + 2) // 3 * 4]
+            self.position += len(encoded_chunk)
+            self.pending += base64.b64decode(encoded_chunk)
+
+        data, self.pending = self.pending[:size], self.pending[size:]
+        return data
+
+
+def parse_multipart(request, body: str, content_type: str, is_base64_encoded: bool) -> Tuple[QueryDict, MultiValueDict]:
+    """Parses a multipart body into the request's POST and FILES, streaming it through Django's upload handlers.
+
+    Parts are held in memory up to `FILE_UPLOAD_MAX_MEMORY_SIZE` and spooled to a temporary file (in /tmp) above it,
+    see `FILE_UPLOAD_HANDLERS`.
+    """
+    stream = Base64Stream(body) if is_base64_encoded else io.BytesIO(body.encode('utf-8'))
+    content_length = len(stream) if is_base64_encoded else len(stream.getbuffer())
+
+    meta = {'CONTENT_TYPE': content_type, 'CONTENT_LENGTH': content_length}
+    upload_handlers = [load_handler(handler_path, request) for handler_path in settings.FILE_UPLOAD_HANDLERS]
+
+    return MultiPartParser(meta, stream, upload_handlers, settings.DEFAULT_CHARSET).parse()
+
+
+def close_files(files: MultiValueDict):
+    """Closes the uploaded files of a request, which deletes the ones spooled to a temporary file."""
+    for _, uploaded_files in files.lists():
+        for uploaded_file in uploaded_files:
+            uploaded_file.close()
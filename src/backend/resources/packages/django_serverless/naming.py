@@ -0,0 +1,14 @@
+import re
+from functools import lru_cache
+
+camel_to_snake_pattern = re.compile(r'(?<!^)(?=[A-Z])')
+
+
+@lru_cache(maxsize=1024)
+def camel_to_snake(name: str):
+    return camel_to_snake_pattern.sub('_', name).lower()
+
+
+def snake_to_camel(name: str):
+    first, *others = name.split('_')
+    return ''.join([first.lower(), *map(str.title, others)])
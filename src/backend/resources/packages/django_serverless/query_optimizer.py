@@ -0,0 +1,289 @@
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Set, Union
+
+from django.db.models import Model, Prefetch, QuerySet, prefetch_related_objects
+from django.db.models.query import ModelIterable
+
+from graphene_extender.classes import ReverseModelTypeMeta
+
+from django_serverless.naming import camel_to_snake
+
+
+@dataclass
+class QuerySetPlan:
+    select_related: List[str] = field(default_factory=list)
+    prefetch_related: List[Union[str, Prefetch]] = field(default_factory=list)
+    only: List[str] = field(default_factory=list)
+
+
+@lru_cache(maxsize=None)
+def relations_of(model) -> Dict:
+    """Maps the attribute name used to access each relation of the model (what `resolve_fields` reads) to its field."""
+    relations = {}
+
+    for model_field in model._meta.get_fields():
+        if not model_field.is_relation:
+            continue
+
+        if model_field.auto_created and not model_field.concrete:
+            # Reverse relations are accessed by their accessor name, e.g. `comment_set` or the `related_name`
+            relations[model_field.get_accessor_name()] = model_field
+        else:
+            relations[model_field.name] = model_field
+
+    return relations
+
+
+def is_single_valued(relation):
+    """Forward FK/one-to-one and reverse one-to-one relations can be joined with `select_related`."""
+    if relation.many_to_one:
+        return relation.concrete
+
+    return relation.one_to_one
+
+
+def has_custom_resolver(model, graphene_type: Optional[type], field_name_snake_case: str):
+    """Fields resolved by a graphene `resolve_*` method may not read the relation at all, so they're left alone."""
+    resolver_name = f'resolve_{field_name_snake_case}'
+
+    return any(
+        getattr(type_, resolver_name, None) is not None
+        for type_ in (graphene_type, getattr(model, ReverseModelTypeMeta.REVERSE_ATTR_NAME, None))
+        if type_ is not None
+    )
+
+
+@lru_cache(maxsize=None)
+def concrete_fields_of(model) -> Dict:
+    """Maps both the name and the attname (e.g. `author` and `author_id`) of every column to its field."""
+    return {
+        **{model_field.attname: model_field for model_field in model._meta.concrete_fields},
+        **{model_field.name: model_field for model_field in model._meta.concrete_fields},
+    }
+
+
+def field_dependencies_of(model, graphene_type: Optional[type]) -> Dict[str, List[str]]:
+    """Columns needed by computed fields, declared on the graphene type.
+
+    E.g. `field_dependencies = {'full_name': ['first_name', 'last_name']}` on a type with a `resolve_full_name`.
+    """
+    dependencies = {}
+
+    for type_ in (getattr(model, ReverseModelTypeMeta.REVERSE_ATTR_NAME, None), graphene_type):
+        if type_ is not None:
+            dependencies.update(getattr(type_, 'field_dependencies', None) or {})
+
+    return dependencies
+
+
+def requested_columns(model, selection_set: Dict, graphene_type: Optional[type] = None,
+                      required: Iterable[str] = (), annotations: Iterable[str] = ()) -> Optional[Set[str]]:
+    """Columns of the model needed to serialize the selection set, or None if they can't be known safely.
+
+    That's the case for fields served by a `resolve_*` method or a model property without declared dependencies.
+    """
+    concrete_fields = concrete_fields_of(model)
+    relations = relations_of(model)
+    dependencies = field_dependencies_of(model, graphene_type)
+    columns = set(required)
+
+    for field_name in selection_set:
+        if field_name == '__typename':
+            continue
+
+        field_name_snake_case = camel_to_snake(field_name)
+
+        if field_name_snake_case in dependencies:
+            columns.update(dependencies[field_name_snake_case])
+
+        elif has_custom_resolver(model, graphene_type, field_name_snake_case):
+            return None
+
+        elif (relation := relations.get(field_name_snake_case)) is not None:
+            if relation.related_model is None:
+                columns.update((relation.ct_field, relation.fk_field))
+            elif relation.concrete:
+                columns.add(relation.name)
+
+        elif (concrete_field := concrete_fields.get(field_name_snake_case)) is not None:
+            columns.add(concrete_field.name)
+
+        elif field_name_snake_case != 'pk' and field_name_snake_case not in annotations:
+            return None
+
+    return columns
+
+
+def build_plan(model, selection_set: Dict, graphene_type: Optional[type] = None,
+               prefix: str = '', plan: Optional[QuerySetPlan] = None,
+               prune_columns: bool = False, required: Iterable[str] = (),
+               annotations: Iterable[str] = ()) -> QuerySetPlan:
+    plan = QuerySetPlan() if plan is None else plan
+    relations = relations_of(model)
+
+    if prune_columns:
+        columns = requested_columns(model, selection_set, graphene_type, required, annotations)
+        # When this level can't be pruned, it's loaded whole and so are its select_related children
+        prune_columns = columns is not None
+        if prune_columns:
+            plan.only.extend(f'{prefix}{column}' for column in sorted(columns))
+
+    for field_name, subset in selection_set.items():
+        if len(subset) == 0:
+            continue
+
+        field_name_snake_case = camel_to_snake(field_name)
+        if (relation := relations.get(field_name_snake_case)) is None:
+            continue
+
+        if has_custom_resolver(model, graphene_type, field_name_snake_case):
+            continue
+
+        lookup = f'{prefix}{field_name_snake_case}'
+
+        if relation.related_model is None:
+            # Generic foreign keys can only be prefetched, and their target model is only known per row
+            plan.prefetch_related.append(lookup)
+
+        elif is_single_valued(relation):
+            plan.select_related.append(lookup)
+            build_plan(relation.related_model, subset, prefix=f'{lookup}__', plan=plan, prune_columns=prune_columns)
+
+        else:
+            # Prefetched reverse FK rows are matched to their parent through the FK, so it has to be loaded
+            related_required = (relation.field.name,) if relation.one_to_many else ()
+            related_queryset = apply_plan(
+                relation.related_model._default_manager.all(),
+                build_plan(relation.related_model, subset, prune_columns=prune_columns, required=related_required),
+            )
+            plan.prefetch_related.append(Prefetch(lookup, queryset=related_queryset))
+
+    return plan
+
+
+def prefetch_path_of(lookup: Union[str, Prefetch]) -> str:
+    return lookup.prefetch_to if isinstance(lookup, Prefetch) else lookup
+
+
+def merge_prefetches(queryset: QuerySet, lookups: List[Union[str, Prefetch]]) -> QuerySet:
+    """Adds the lookups before the ones the resolver already prefetches, which then reuse the fetched rows.
+
+    Django refuses a Prefetch with a queryset on a path that was prefetched before it, so the lookups go first, and the
+    paths the resolver prefetches with its own queryset are left to it.
+    """
+    resolver_lookups = queryset._prefetch_related_lookups
+    if not resolver_lookups:
+        return queryset.prefetch_related(*lookups)
+
+    custom_paths = {
+        lookup.prefetch_to
+        for lookup in resolver_lookups
+        if isinstance(lookup, Prefetch) and lookup.queryset is not None
+    }
+    lookups = [lookup for lookup in lookups if prefetch_path_of(lookup) not in custom_paths]
+
+    return queryset.prefetch_related(None).prefetch_related(*lookups, *resolver_lookups)
+
+
+def apply_plan(queryset: QuerySet, plan: QuerySetPlan) -> QuerySet:
+    if plan.select_related:
+        queryset = queryset.select_related(*plan.select_related)
+
+    if plan.prefetch_related:
+        queryset = merge_prefetches(queryset, plan.prefetch_related)
+
+    if plan.only:
+        queryset = queryset.only(*plan.only)
+
+    return queryset
+
+
+def has_deferred_loading(queryset: QuerySet):
+    """Whether the resolver already called only()/defer() itself."""
+    deferred_fields, is_defer = queryset.query.deferred_loading
+    return len(deferred_fields) > 0 or not is_defer
+
+
+def joined_columns(model, select_related: Dict, only: List[str], prefix: str = '') -> Optional[List[str]]:
+    """Columns only() has to keep for the relations the resolver joined itself with select_related().
+
+    Those are the FKs of the joined paths, and every column of the models on them that the plan doesn't prune, which
+    would be deferred otherwise. None when a path isn't a known relation.
+    """
+    columns = []
+    relations = relations_of(model)
+
+    for field_name, nested_select_related in select_related.items():
+        if (relation := relations.get(field_name)) is None or relation.related_model is None:
+            return None
+
+        lookup = f'{prefix}{field_name}'
+        if relation.concrete:
+            columns.append(lookup)
+
+        if nested_select_related:
+            related_model = relation.related_model
+            if not any(column.startswith(f'{lookup}__') for column in only):
+                columns.extend(f'{lookup}__{field.name}' for field in related_model._meta.concrete_fields)
+
+            if (nested_columns := joined_columns(related_model, nested_select_related, only, f'{lookup}__')) is None:
+                return None
+            columns.extend(nested_columns)
+
+    return columns
+
+
+def optimize_queryset(queryset: QuerySet, selection_set: Dict, graphene_type: Optional[type] = None,
+                      prune_columns: bool = False) -> QuerySet:
+    # Already evaluated, or returning dicts/tuples through values()/values_list()
+    if queryset._result_cache is not None or not issubclass(queryset._iterable_class, ModelIterable):
+        return queryset
+
+    # union()/intersection()/difference() don't support select_related, prefetch_related nor only()
+    if queryset.query.combinator:
+        return queryset
+
+    # Nor can the columns be pruned when the resolver picked them, selects extra() ones or joins every relation
+    query = queryset.query
+    prune_columns = prune_columns and not has_deferred_loading(queryset) and not query.extra_select
+    prune_columns = prune_columns and query.select_related is not True
+
+    plan = build_plan(queryset.model, selection_set, graphene_type, prune_columns=prune_columns,
+                      annotations=query.annotations)
+
+    if plan.only and query.select_related:
+        # A relation the resolver joins can't be deferred
+        if (columns := joined_columns(queryset.model, query.select_related, plan.only)) is None:
+            plan.only.clear()
+        else:
+            plan.only.extend(columns)
+
+    return apply_plan(queryset, plan)
+
+
+def optimize_instances(instances: List[Model], selection_set: Dict, graphene_type: Optional[type] = None):
+    """Instances are already fetched, so every relation (even the single valued ones) gets prefetched in bulk."""
+    plan = build_plan(instances[0].__class__, selection_set, graphene_type)
+    lookups = [*plan.select_related, *plan.prefetch_related]
+
+    if lookups:
+        prefetch_related_objects(instances, *lookups)
+
+
+def optimize_result(result, selection_set: Dict, graphene_type: Optional[type] = None, prune_columns: bool = False):
+    """Applies select_related/prefetch_related, derived from the selection set, to a resolver result.
+
+    Forward FK/one-to-one paths are joined, reverse and many-to-many paths are prefetched, so `resolve_fields` doesn't
+    issue a query per related access. With `prune_columns`, QuerySets only load the requested columns through only().
+    """
+    if isinstance(result, QuerySet):
+        return optimize_queryset(result, selection_set, graphene_type, prune_columns)
+
+    if isinstance(result, Model):
+        optimize_instances([result], selection_set, graphene_type)
+
+    elif isinstance(result, list) and len(result) > 0 and isinstance(result[0], Model):
+        optimize_instances(result, selection_set, graphene_type)
+
+    return result
@@ -0,0 +1,140 @@
+import base64
+import gzip
+from typing import Dict, Optional, Set, Tuple
+
+from django.http.response import HttpResponseBase
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, responses are gzipped without it
+    brotli = None
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5  # Higher qualities are too slow for responses compressed on every request
+COMPRESSION_ENCODINGS = ('br', 'gzip')
+
+# Content types whose body is sent as text, anything else is base64 encoded
+TEXT_CONTENT_TYPES = ('text/', 'application/json', 'application/javascript', 'application/xml')
+TEXT_CONTENT_TYPE_SUFFIXES = ('+json', '+xml')
+
+
+def is_text_content_type(content_type: str) -> bool:
+    media_type = content_type.split(';', 1)[0].strip().lower()
+    return media_type.startswith(TEXT_CONTENT_TYPES) or media_type.endswith(TEXT_CONTENT_TYPE_SUFFIXES)
+
+
+def content_of(response: HttpResponseBase) -> bytes:
+    if response.streaming:
+        return b''.join(response.streaming_content)
+
+    return response.content
+
+
+def encode_body(content: bytes, content_type: str, charset: str) -> Tuple[str, bool]:
+    """The body as API Gateway expects it, and whether it's base64 encoded."""
+    if is_text_content_type(content_type):
+        try:
+            return content.decode(charset), False
+        except UnicodeDecodeError:
+            pass
+
+    return base64.b64encode(content).decode('ascii'), True
+
+
+def to_apigateway_response(response: HttpResponseBase) -> Dict:
+    """Lambda proxy integration response of a Django response, its body passed through as it was encoded by the view.
+
+    Binary and compressed (`Content-Encoding`) bodies are base64 encoded, streaming responses are drained and closed.
+    """
+    try:
+        content = content_of(response)
+    finally:
+        response.close()
+
+    content_type = '' if response.has_header('Content-Encoding') else response.get('Content-Type', '')
+    body, is_base64_encoded = encode_body(content, content_type, response.charset)
+
+    apigateway_response = {
+        'statusCode': response.status_code,
+        'headers': dict(response.items()),
+        'body': body,
+        'isBase64Encoded': is_base64_encoded,
+    }
+
+    if response.cookies:
+        apigateway_response['multiValueHeaders'] = {
+            'Set-Cookie': [morsel.OutputString() for morsel in response.cookies.values()],
+        }
+
+    return apigateway_response
+
+
+def accepted_encodings(accept_encoding: Optional[str]) -> Set[str]:
+    """Encodings of an `Accept-Encoding` header, leaving out the ones refused with `q=0`.
+
+    `*` stands for the encodings compressed with (`COMPRESSION_ENCODINGS`) that the header doesn't name otherwise.
+    """
+    encodings, named_encodings = set(), set()
+
+    for item in (accept_encoding or '').split(','):
+        encoding, *parameters = [part.strip().lower() for part in item.split(';')]
+        quality = next((parameter[2:] for parameter in parameters if parameter.startswith('q=')), '1')
+
+        try:
+            is_accepted = float(quality) > 0
+        except ValueError:
+            is_accepted = False
+
+        if encoding:
+            named_encodings.add(encoding)
+            if is_accepted:
+                encodings.add(encoding)
+
+    if '*' in encodings:
+        encodings.remove('*')
+        encodings.update(encoding for encoding in COMPRESSION_ENCODINGS if encoding not in named_encodings)
+
+    return encodings
+
+
+def compress_response(apigateway_response: Dict, accept_encoding: Optional[str], min_size: Optional[int]) -> Dict:
+    """Compresses the body of a Lambda proxy response with brotli or gzip, as accepted by the client.
+
+    Only text bodies of at least `min_size` bytes are compressed, None disables it. Compressed bodies are base64
+    encoded, API Gateway decodes them back to binary for the client (`binaryMediaTypes` must match).
+    """
+    if min_size is None or apigateway_response.get('isBase64Encoded', False):
+        return apigateway_response
+
+    headers = apigateway_response.get('headers') or {}
+    header_names = {name.lower(): name for name in headers}
+    if 'content-encoding' in header_names:
+        return apigateway_response
+
+    content_type = headers.get(header_names.get('content-type'), 'application/json')
+    if not is_text_content_type(content_type):
+        return apigateway_response
+
+    # API Gateway sends text bodies to the client as UTF-8
+    content = (apigateway_response.get('body') or '').encode('utf-8')
+    if len(content) < min_size:
+        return apigateway_response
+
+    encodings = accepted_encodings(accept_encoding)
+    if brotli is not None and 'br' in encodings:
+        encoding, compressed = 'br', brotli.compress(content, quality=BROTLI_QUALITY)
+    elif 'gzip' in encodings:
+        encoding, compressed = 'gzip', gzip.compress(content, compresslevel=GZIP_LEVEL)
+    else:
+        return apigateway_response
+
+    vary = header_names.get('vary', 'Vary')
+    headers[vary] = f'{headers[vary]}, Accept-Encoding' if vary in headers else 'Accept-Encoding'
+    headers['Content-Encoding'] = encoding
+    headers.pop(header_names.get('content-length'), None)
+
+    apigateway_response['headers'] = headers
+    apigateway_response['body'] = base64.b64encode(compressed).decode('ascii')
+    apigateway_response['isBase64Encoded'] = True
+
+    return apigateway_response
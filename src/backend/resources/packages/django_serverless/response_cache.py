@@ -0,0 +1,105 @@
+import hashlib
+import json
+from collections import OrderedDict
+from time import monotonic
+from typing import Any, Dict, Hashable, Optional
+
+from django_serverless.serializers import dumps
+
+MISSING = object()
+
+
+class ResponseCache:
+    """In-container LRU cache of serialized responses, with a TTL and bounded by the (JSON) size of its entries.
+
+    Entries are kept as JSON, so every hit gets its own copy and nothing done to a returned response changes the entry.
+    """
+
+    def __init__(self, ttl: float, max_bytes: int):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.entries: OrderedDict = OrderedDict()  # key -> (expires_at, size, JSON), least recently used first
+        self.size = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable):
+        if (entry := self.entries.get(key)) is None:
+            self.misses += 1
+            return MISSING
+
+        expires_at, _, serialized = entry
+        if expires_at <= monotonic():
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return MISSING
+
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return json.loads(serialized)
+
+    def set(self, key: Hashable, value: Any):
+        if key in self.entries:
+            self._remove(key)
+
+        serialized = dumps(value)
+        size = len(serialized)
+        if size > self.max_bytes:
+            return
+
+        while self.size + size > self.max_bytes:
+            self._remove(next(iter(self.entries)))
+            self.evictions += 1
+
+        self.entries[key] = (monotonic() + self.ttl, size, serialized)
+        self.size += size
+
+    def _remove(self, key: Hashable):
+        _, size, _ = self.entries.pop(key)
+        self.size -= size
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'expirations': self.expirations,
+            'evictions': self.evictions,
+            'entries': len(self.entries),
+            'bytes': self.size,
+        }
+
+
+def identity_of(request, cache_identity: Optional[str]) -> Optional[str]:
+    """Part of the cache key that separates callers: None (shared), 'user' or 'header:<name>'.
+
+    Header values (e.g. tokens) are hashed, so they aren't kept in memory as they are.
+    """
+    if cache_identity is None:
+        return None
+
+    if cache_identity == 'user':
+        user = getattr(request, 'user', None)
+        return None if user is None or not user.is_authenticated else str(user.pk)
+
+    if cache_identity.startswith('header:'):
+        header_value = request.headers.get(cache_identity[len('header:'):].lower())
+        return None if header_value is None else hashlib.sha256(header_value.encode('utf-8')).hexdigest()
+
+    raise ValueError(f"Unknown cache identity '{cache_identity}', expected None, 'user' or 'header:<name>'")
+
+
+def response_cache_key(event: Dict, selection_set_list: tuple, identity: Optional[str]):
+    event_info = event.get('info', {})
+
+    return (
+        event_info.get('parentTypeName'),
+        event_info.get('fieldName'),
+        json.dumps(event.get('arguments', {}), sort_keys=True, default=str),
+        json.dumps(event.get('source'), sort_keys=True, default=str),
+        selection_set_list,
+        identity,
+    )
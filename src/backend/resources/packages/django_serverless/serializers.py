@@ -0,0 +1,152 @@
+import json
+from dataclasses import fields, is_dataclass
+from datetime import datetime, date, time, timezone
+from decimal import Decimal
+from enum import Enum
+from types import GeneratorType
+from typing import Any, Callable, Dict, Optional
+from uuid import UUID
+
+try:
+    import orjson
+except ImportError:  # orjson is an optional, faster JSON encoder
+    orjson = None
+
+
+def serialize_datetime(value: datetime):
+    """AWSDateTime, in UTC. Naive datetimes are assumed to already be in UTC."""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+
+    return f"{value.isoformat(timespec='milliseconds' if value.microsecond else 'seconds')}Z"
+
+
+def serialize_date(value: date):
+    """AWSDate"""
+    return value.isoformat()
+
+
+def serialize_time(value: time):
+    """AWSTime, keeping the UTC offset of timezone aware times."""
+    return value.isoformat(timespec='milliseconds' if value.microsecond else 'seconds')
+
+
+def serialize_decimal(value: Decimal):
+    # Decimals are exposed as Float in the AppSync schema (see ApiStack._clean_schema)
+    return float(value)
+
+
+def serialize_enum(value: Enum):
+    return serialize_value(value.value)
+
+
+def serialize_iterable(value):
+    return [serialize_value(item) for item in value]
+
+
+def serialize_dict(value: dict):
+    return {key: serialize_value(item) for key, item in value.items()}
+
+
+# Exact type -> encoder, subclasses are matched through their MRO by `encoder_for`
+encoders: Dict[type, Callable[[Any], Any]] = {
+    UUID: str,
+    datetime: serialize_datetime,
+    date: serialize_date,
+    time: serialize_time,
+    Decimal: serialize_decimal,
+    Enum: serialize_enum,
+    GeneratorType: serialize_iterable,
+    list: serialize_iterable,
+    tuple: serialize_iterable,
+    set: serialize_iterable,
+    frozenset: serialize_iterable,
+    dict: serialize_dict,
+}
+
+# Value type -> encoder, or None when the value is already serializable as is
+dispatch_table: Dict[type, Optional[Callable[[Any], Any]]] = {
+    str: None,
+    int: None,
+    float: None,
+    bool: None,
+    type(None): None,
+}
+
+
+def register_encoder(type_: type, encoder: Callable[[Any], Any]):
+    """Registers how values of `type_` (and its subclasses, unless they have their own encoder) are serialized."""
+    encoders[type_] = encoder
+
+    for value_type in list(dispatch_table):
+        if issubclass(value_type, type_):
+            del dispatch_table[value_type]
+
+
+def encoder_for(value_type: type) -> Optional[Callable[[Any], Any]]:
+    encoder = next((encoders[klass] for klass in value_type.__mro__ if klass in encoders), None)
+    dispatch_table[value_type] = encoder
+
+    return encoder
+
+
+def serialize_value(value):
+    value_type = value.__class__
+
+    if value_type in dispatch_table:
+        encoder = dispatch_table[value_type]
+    else:
+        encoder = encoder_for(value_type)
+
+    return value if encoder is None else encoder(value)
+
+
+def json_default(value):
+    if (encoder := encoder_for(value.__class__)) is not None:
+        return encoder(value)
+
+    # orjson serializes dataclasses as dicts of their fields
+    if is_dataclass(value) and not isinstance(value, type):
+        return {data_field.name: getattr(value, data_field.name) for data_field in fields(value)}
+
+    raise TypeError(f'Object of type {value.__class__.__name__} is not JSON serializable')
+
+
+def serialize_key(key):
+    """A dict key as orjson's OPT_NON_STR_KEYS serializes it, for the json module which only takes str/number keys."""
+    if key is None or isinstance(key, (str, int, float, bool)):
+        return key
+
+    if isinstance(key, Enum):
+        return serialize_key(key.value)
+
+    if isinstance(key, UUID):
+        return str(key)
+
+    if isinstance(key, (datetime, date, time)):
+        return key.isoformat()
+
+    raise TypeError(f'Dict key of type {key.__class__.__name__} is not JSON serializable')
+
+
+def serialize_keys(value):
+    if isinstance(value, dict):
+        return {serialize_key(key): serialize_keys(item) for key, item in value.items()}
+
+    if isinstance(value, (list, tuple)):
+        return [serialize_keys(item) for item in value]
+
+    return value
+
+
+def dumps(value) -> str:
+    """JSON encodes a response body, with orjson when it's installed. Both encoders take the same values and keys."""
+    if orjson is not None:
+        option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        return orjson.dumps(value, default=json_default, option=option).decode('utf-8')
+
+    try:
+        return json.dumps(value, default=json_default)
+    except TypeError:
+        # Keys json can't encode, the body is encoded again with them serialized
+        return json.dumps(serialize_keys(value), default=lambda item: serialize_keys(json_default(item)))
@@ -0,0 +1,139 @@
+import gc
+from time import perf_counter, sleep
+from typing import Callable, Dict, List, Optional, Tuple
+
+from django.apps import apps
+from django.conf import settings
+from django.urls import get_resolver
+from django.utils.module_loading import import_string
+
+from django_serverless.connection import connection_keeper
+from django_serverless.logger import logger
+from django_serverless.query_optimizer import concrete_fields_of, relations_of
+
+
+class InitPipeline:
+    """Work declared by the generated handler to run in the Lambda init phase, which has boosted CPU.
+
+    Steps run in declaration order and each one is timed; the report is logged once per container, so the gain on the
+    first request can be followed in the logs.
+    """
+
+    def __init__(self):
+        self.steps: List[Tuple[str, Callable]] = []
+        self.timings: Dict[str, float] = {}  # step name -> milliseconds
+        self.last_mark: Optional[float] = None
+
+    def mark(self, name: str, since: Optional[float] = None):
+        """Records the time spent on work done outside the pipeline, e.g. `django.setup()`."""
+        now = perf_counter()
+        since = self.last_mark if since is None else since
+
+        if since is not None:
+            self.timings[name] = (now - since) * 1000
+
+        self.last_mark = now
+
+    def step(self, name: str, function: Callable):
+        self.steps.append((name, function))
+
+    def run(self) -> Dict[str, float]:
+        for name, function in self.steps:
+            started_at = perf_counter()
+            function()
+            self.timings[name] = (perf_counter() - started_at) * 1000
+
+        self.steps = []
+        logger.info('init pipeline finished', extra={'fields': {
+            'init_timings_ms': {name: round(timing, 3) for name, timing in self.timings.items()},
+            'init_total_ms': round(sum(self.timings.values()), 3),
+        }})
+
+        return self.timings
+
+
+init_pipeline = InitPipeline()
+
+
+def import_modules():
+    """Imports what the first request would otherwise import lazily: URLs, graphene middlewares and schema."""
+    # Importing the urlconf and populating the reverse lookups happens on the first resolve/reverse
+    get_resolver().reverse_dict
+
+    graphene_settings = getattr(settings, 'GRAPHENE', {})
+
+    for middleware_path in graphene_settings.get('MIDDLEWARE', []):
+        import_string(middleware_path)
+
+    if (schema_path := graphene_settings.get('SCHEMA')) is not None:
+        import_string(schema_path)
+
+
+def prepare_models():
+    """Plans the relations and columns of every model, used by the query optimizer."""
+    for model in apps.get_models():
+        relations_of(model)
+        concrete_fields_of(model)
+
+
+def freeze_heap():
+    """Moves everything allocated so far to a permanent generation, so it's never scanned by the GC again."""
+    gc.collect()
+    gc.freeze()
+
+
+class Primer:
+    """Keeps a container hot when it gets a warmer event, instead of only keeping it alive.
+
+    The DB connection is checked (and re-opened), lazily imported modules are imported, the `hook` (dotted path to a
+    function) is called and the priming `events` are replayed through the handler, which fills its caches.
+    """
+
+    def __init__(self, events: Optional[List[Dict]] = None, hook: Optional[str] = None):
+        self.events = events or []
+        self.hook = hook
+
+    def prime(self, handler: Callable, context, hold_ms: int = 0) -> Dict:
+        """Primes the container, then holds the invocation until `hold_ms` have passed since it started.
+
+        Holding keeps the sandbox busy, so the warmer's other overlapping invocations are routed to other sandboxes.
+        """
+        # Replayed events skip the invocation metrics, they aren't traffic
+        handler = getattr(handler, '__wrapped__', handler)
+
+        steps: List[Tuple[str, Callable]] = [
+            ('db_connection', connection_keeper.refresh),
+            ('import_modules', import_modules),
+        ]
+        if self.hook is not None:
+            # Imported in the step, so a wrong path is reported like any other failed step
+            steps.append(('hook', lambda: import_string(self.hook)()))
+        if self.events:
+            steps.append(('events', lambda: [handler(event, context) for event in self.events]))
+
+        started_at = perf_counter()
+        timings: Dict[str, float] = {}
+        errors: Dict[str, str] = {}
+
+        for name, function in steps:
+            step_started_at = perf_counter()
+            try:
+                function()
+            except Exception as e:
+                # A failed step must not fail the warmer, the next request will hit the same error anyway
+                errors[name] = repr(e)
+            timings[name] = round((perf_counter() - step_started_at) * 1000, 3)
+
+        priming_ms = (perf_counter() - started_at) * 1000
+        if hold_ms > priming_ms:
+            sleep((hold_ms - priming_ms) / 1000)
+
+        report = {
+            'primed': not errors,
+            'priming_ms': round(priming_ms, 3),
+            'priming_timings_ms': timings,
+            'priming_errors': errors,
+        }
+        logger.info('container primed', extra={'fields': report})
+
+        return report
@@ -0,0 +1,26 @@
+import os
+import sys
+
+import django
+import pytest
+from django.core.management import call_command
+from django.db import transaction
+
+# The layer packages are importable at the top level, as in a lambda container
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sqlite_settings')
+
+django.setup()
+
+
+@pytest.fixture(scope='session')
+def django_db_setup():
+    call_command('migrate', run_syncdb=True, verbosity=0)
+
+
+@pytest.fixture
+def db(django_db_setup):
+    """The test database, whatever the test writes is rolled back."""
+    with transaction.atomic():
+        yield
+        transaction.set_rollback(True)
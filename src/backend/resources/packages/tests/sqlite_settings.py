@@ -0,0 +1,22 @@
+"""Settings of the `django_serverless` tests, on an in-memory SQLite database."""
+
+SECRET_KEY = 'django-serverless-tests'
+
+INSTALLED_APPS = [
+    'django.contrib.contenttypes',
+    'testapp',
+]
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+    },
+}
+
+MIDDLEWARE = []
+ROOT_URLCONF = 'testapp.urls'
+GRAPHENE = {'MIDDLEWARE': []}
+
+USE_TZ = True
+DEFAULT_AUTO_FIELD = 'django.db.models.AutoField'
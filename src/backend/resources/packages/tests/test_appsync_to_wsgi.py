@@ -0,0 +1,104 @@
+import graphene
+import pytest
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+pytest.importorskip('graphene_extender')
+
+from django_serverless.appsync_to_wsgi import (  # noqa: E402
+    ResultTooLargeError, appsync_to_wsgi_of, batch_resolver, build_appsync_request, compile_selection_set,
+    iterate_result,
+)
+from django_serverless.query_optimizer import optimize_result  # noqa: E402
+from testapp.factories import create_books  # noqa: E402
+from testapp.models import Book  # noqa: E402
+
+
+def test_streamed_results_keep_their_prefetches(db):
+    create_books(count=6)
+    selection_set = compile_selection_set(('title', 'comments', 'comments/text'))
+    queryset = optimize_result(Book.objects.order_by('pk'), selection_set)
+
+    with CaptureQueriesContext(connection) as queries:
+        books = iterate_result(queryset, chunk_size=2)
+        comments = [[comment.text for comment in book.comments.all()] for book in books]
+
+    # The books, then the comments of each chunk of 2 books
+    assert len(queries) == 1 + 3
+    assert comments[5] == ['Comment 5.0', 'Comment 5.1']
+
+
+def test_results_over_the_maximum_fail(db):
+    create_books(count=3)
+
+    assert len(list(iterate_result(Book.objects.all(), chunk_size=2, max_results=3))) == 3
+
+    with pytest.raises(ResultTooLargeError):
+        list(iterate_result(Book.objects.all(), chunk_size=2, max_results=2))
+
+
+class BookType(graphene.ObjectType):
+    id = graphene.ID()
+    title = graphene.String()
+
+
+class LambdaContext:
+    function_name = 'book'
+    aws_request_id = 'request'
+    memory_limit_in_mb = 128
+
+    @staticmethod
+    def get_remaining_time_in_millis():
+        return 15000
+
+
+def book_event(source):
+    return {
+        'source': source,
+        'arguments': {},
+        'request': {'headers': {}},
+        'info': {'parentTypeName': 'Comment', 'fieldName': 'book', 'selectionSetList': ['id', 'title']},
+    }
+
+
+@batch_resolver
+def resolve_books(root, info):
+    books = Book.objects.in_bulk([source['bookId'] for source in root])
+    return [books.get(source['bookId']) for source in root]
+
+
+def test_batch_resolvers_get_the_sources_of_the_batch(db):
+    books = create_books(count=3)
+    handler = appsync_to_wsgi_of(BookType, batch=True)(resolve_books)
+    events = [book_event({'bookId': book.pk}) for book in reversed(books)]
+
+    with CaptureQueriesContext(connection) as queries:
+        content = handler(events, LambdaContext())
+
+    assert len(queries) == 1
+    assert [row['title'] for row in content] == ['Book 2', 'Book 1', 'Book 0']
+    assert handler(book_event({'bookId': books[0].pk}), LambdaContext())['title'] == 'Book 0'
+
+
+def test_batch_resolvers_have_to_opt_in():
+    def resolver(root, info):
+        return None
+
+    with pytest.raises(ImproperlyConfigured):
+        appsync_to_wsgi_of(BookType, batch=True)(resolver)
+
+    with pytest.raises(ImproperlyConfigured):
+        appsync_to_wsgi_of(BookType)(resolve_books)
+
+    with pytest.raises(ImproperlyConfigured):
+        appsync_to_wsgi_of(BookType)(resolver)([book_event({'bookId': 1})], LambdaContext())
+
+
+def test_appsync_requests_have_the_event_info_as_body():
+    event = book_event(None)
+    request = build_appsync_request(event)
+
+    assert request.json == event['info']
+    assert request.body == request.raw_body.encode('utf-8')
+    assert request.POST == {}
@@ -0,0 +1,83 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from django_serverless.dataloader import DataLoader, ModelLoader, dispatch_loaders
+from testapp.factories import create_books
+from testapp.models import Book
+
+
+class SquareLoader(DataLoader):
+    def __init__(self):
+        super().__init__()
+        self.batches = []
+
+    def batch_load(self, keys):
+        self.batches.append(keys)
+        return [key * key for key in keys]
+
+
+class BookLoader(ModelLoader):
+    model = Book
+
+
+class Context:
+    def __init__(self):
+        self.dataloaders = {}
+
+
+class Info:
+    def __init__(self):
+        self.context = Context()
+
+
+def test_loads_are_deduplicated_and_batched():
+    loader = SquareLoader()
+    pending = [loader.load(2), loader.load(3), loader.load(2)]
+    many = loader.load_many([3, 4])
+
+    dispatch_loaders({SquareLoader: loader})
+
+    assert [value.get() for value in pending] == [4, 9, 4]
+    assert many.get() == [9, 16]
+    assert loader.batches == [[2, 3, 4]]
+
+
+def test_results_are_memoized():
+    loader = SquareLoader()
+    loader.load(2).get()
+    loader.load(2).get()
+
+    assert loader.batches == [[2]]
+
+
+def test_one_loader_per_context():
+    info = Info()
+
+    assert SquareLoader.of(info) is SquareLoader.of(info)
+    assert SquareLoader.of(info) is not SquareLoader.of(Info())
+
+
+def test_batch_load_must_return_one_value_per_key():
+    class ShortLoader(DataLoader):
+        def batch_load(self, keys):
+            return keys[:-1]
+
+    loader = ShortLoader()
+    loader.load(1)
+    loader.load(2)
+
+    with pytest.raises(ValueError):
+        loader.dispatch()
+
+
+def test_model_loader_loads_with_one_query(db):
+    books = create_books()
+    loader = BookLoader()
+    pending = [loader.load(book.pk) for book in books] + [loader.load(0)]
+
+    with CaptureQueriesContext(connection) as queries:
+        values = [value.get() for value in pending]
+
+    assert len(queries) == 1
+    assert values == [*books, None]
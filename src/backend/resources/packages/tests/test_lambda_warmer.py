@@ -0,0 +1,117 @@
+import os
+import sys
+from datetime import datetime, timezone
+
+import pytest
+
+pytest.importorskip('boto3')
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'lambda_warmer'))
+
+import lambda_warmer  # noqa: E402
+from lambda_warmer import (  # noqa: E402
+    TrafficProfile, WarmTarget, adaptive_demand, fetch_concurrency, forecast_concurrency, plan_concurrency,
+    read_targets,
+)
+
+ARN = 'arn:aws:lambda:eu-west-1:123456789012:function:{}:live'
+
+
+class CloudWatch:
+    """GetMetricData of fixed values per query id, one per minute from `start_minute`."""
+
+    def __init__(self, start_minute, series_by_id):
+        self.start_minute = start_minute
+        self.series_by_id = series_by_id
+        self.requests = []
+
+    def get_metric_data(self, **request):
+        self.requests.append(request)
+
+        return {'MetricDataResults': [
+            {
+                'Id': query['Id'],
+                'Timestamps': [
+                    datetime.fromtimestamp((self.start_minute + offset) * 60, tz=timezone.utc)
+                    for offset in range(len(self.series_by_id.get(query['Id'], [])))
+                ],
+                'Values': self.series_by_id.get(query['Id'], []),
+            }
+            for query in request['MetricDataQueries']
+        ]}
+
+
+def test_read_targets():
+    targets = read_targets({'f0': ARN.format('a'), 'c0': '3', 'p0': 'predictive', 'f1': ARN.format('b'), 'path': '/'})
+
+    assert targets == [WarmTarget('a', ARN.format('a'), 3, 'predictive'), WarmTarget('b', ARN.format('b'), 1)]
+
+
+def test_forecast_follows_the_peak_and_the_trend():
+    assert forecast_concurrency([0.0] * 15) == 0
+    assert forecast_concurrency([1.0] * 10 + [4.0, 1.0, 1.0, 1.0, 1.0]) == 4
+    assert forecast_concurrency([float(minute) for minute in range(15)]) == 17
+
+
+def test_fetched_concurrency_leaves_out_the_warm_invocations():
+    end = 1_000_000 * 60
+    start_minute = end // 60 - lambda_warmer.LOOKBACK_MINUTES
+    # The warmer's 3 invocations run in the last minute only, the traffic in the two before
+    cloudwatch = CloudWatch(start_minute, {
+        'c0': [0.0] * 12 + [2.0, 2.0, 5.0],
+        'i0': [0.0] * 12 + [10.0, 10.0, 13.0],
+        'w0': [0.0] * 14 + [3.0],
+    })
+
+    concurrency = fetch_concurrency([WarmTarget('a', ARN.format('a'), 5, 'predictive')], cloudwatch, end=end)
+
+    assert concurrency['a'] == [0.0] * 12 + [2.0, 2.0, 2.0]
+    assert len(cloudwatch.requests) == 1
+
+
+def test_warm_invocations_alone_do_not_sustain_the_forecast():
+    end = 1_000_000 * 60
+    start_minute = end // 60 - lambda_warmer.LOOKBACK_MINUTES
+    cloudwatch = CloudWatch(start_minute, {
+        'c0': [4.0] * 15,
+        'i0': [4.0] * 15,
+        'w0': [4.0] * 15,
+    })
+
+    concurrency = fetch_concurrency([WarmTarget('a', ARN.format('a'), 5, 'predictive')], cloudwatch, end=end)
+
+    assert forecast_concurrency(concurrency['a']) == 0
+
+
+def test_traffic_profile():
+    # Two days, starting at midnight: traffic at 8:00 both days, at 9:00 on one of them
+    hourly_peaks = [0.0] * 48
+    hourly_peaks[8], hourly_peaks[32], hourly_peaks[9] = 2.0, 3.0, 1.0
+
+    profile = TrafficProfile.of(hourly_peaks, 0)
+
+    assert profile.activity[8] == 1.0 and profile.peak[8] == 3
+    assert profile.activity[9] == 0.5 and profile.peak[9] == 1
+    assert profile.activity[10] == 0.0
+
+
+def test_adaptive_demand_warms_ahead_of_the_busy_hours():
+    activity, peak = [0.0] * 24, [0] * 24
+    activity[8], peak[8] = 1.0, 6
+    profile = TrafficProfile(activity, peak)
+
+    assert adaptive_demand(1, profile, 8 * 3600) == 6
+    assert adaptive_demand(0, profile, 3 * 3600) == 0
+    assert adaptive_demand(2, profile, 3 * 3600) == 2
+
+
+def test_plan_shares_the_budget():
+    targets = [
+        WarmTarget('static', ARN.format('static'), 2),
+        WarmTarget('hot', ARN.format('hot'), 10, 'predictive'),
+        WarmTarget('cold', ARN.format('cold'), 10, 'predictive'),
+    ]
+
+    plan = plan_concurrency(targets, {'hot': 20, 'cold': 1}, budget=6)
+
+    assert {target.name: target.concurrency for target in plan} == {'static': 2, 'hot': 3, 'cold': 1}
@@ -0,0 +1,63 @@
+import base64
+import os
+
+from django.http import HttpRequest
+from django.test import override_settings
+
+from django_serverless.multipart import Base64Stream, close_files, parse_multipart
+
+BOUNDARY = 'boundary'
+CONTENT_TYPE = f'multipart/form-data; boundary={BOUNDARY}'
+
+
+def multipart_body(file_content: bytes) -> bytes:
+    return b'\r\n'.join([
+        f'--{BOUNDARY}'.encode(),
+        b'Content-Disposition: form-data; name="title"',
+        b'',
+        b'Earthsea',
+        f'--{BOUNDARY}'.encode(),
+        b'Content-Disposition: form-data; name="cover"; filename="cover.png"',
+        b'Content-Type: image/png',
+        b'',
+        file_content,
+        f'--{BOUNDARY}--'.encode(),
+        b'',
+    ])
+
+
+def test_base64_stream_decodes_in_chunks():
+    content = bytes(range(256)) * 10
+    stream = Base64Stream(base64.b64encode(content).decode('ascii'))
+
+    chunks = [stream.read(7) for _ in range(10)]
+    chunks.append(stream.read())
+
+    assert len(Base64Stream(base64.b64encode(content).decode('ascii'))) == len(content)
+    assert b''.join(chunks) == content
+
+
+def test_parses_fields_and_files():
+    body = base64.b64encode(multipart_body(b'\x89PNG')).decode('ascii')
+
+    post, files = parse_multipart(HttpRequest(), body, CONTENT_TYPE, is_base64_encoded=True)
+
+    assert post['title'] == 'Earthsea'
+    assert files['cover'].name == 'cover.png'
+    assert files['cover'].read() == b'\x89PNG'
+
+
+@override_settings(FILE_UPLOAD_MAX_MEMORY_SIZE=10)
+def test_large_files_are_spooled_and_deleted_when_closed():
+    content = b'x' * 1000
+    body = base64.b64encode(multipart_body(content)).decode('ascii')
+
+    _, files = parse_multipart(HttpRequest(), body, CONTENT_TYPE, is_base64_encoded=True)
+    path = files['cover'].temporary_file_path()
+
+    assert os.path.exists(path)
+    assert files['cover'].read() == content
+
+    close_files(files)
+
+    assert not os.path.exists(path)
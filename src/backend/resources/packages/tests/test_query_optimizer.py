@@ -0,0 +1,143 @@
+import pytest
+from django.db import connection
+from django.db.models import Prefetch
+from django.test.utils import CaptureQueriesContext
+
+pytest.importorskip('graphene_extender')
+
+from django_serverless.appsync_to_wsgi import compile_selection_set  # noqa: E402
+from django_serverless.query_optimizer import optimize_result  # noqa: E402
+from testapp.factories import create_books  # noqa: E402
+from testapp.models import Book, Comment  # noqa: E402
+
+
+def selection(*fields):
+    return compile_selection_set(tuple(fields))
+
+
+def read(books, *paths):
+    """Reads every path of the selection from the books, as `resolve_fields` would."""
+    rows = []
+    for book in books:
+        row = {'title': book.title}
+        if 'author' in paths:
+            row['author'] = book.author.name
+        if 'comments' in paths:
+            row['comments'] = [comment.text for comment in book.comments.all()]
+        rows.append(row)
+
+    return rows
+
+
+def test_forward_relations_are_joined(db):
+    create_books()
+    queryset = optimize_result(Book.objects.all(), selection('title', 'author', 'author/name'))
+
+    with CaptureQueriesContext(connection) as queries:
+        read(queryset, 'author')
+
+    assert len(queries) == 1
+
+
+def test_reverse_relations_are_prefetched(db):
+    create_books()
+    queryset = optimize_result(Book.objects.all(), selection('title', 'comments', 'comments/text'))
+
+    with CaptureQueriesContext(connection) as queries:
+        rows = read(queryset, 'comments')
+
+    assert len(queries) == 2
+    assert rows[0]['comments'] == ['Comment 0.0', 'Comment 0.1']
+
+
+def test_prefetches_of_the_resolver_are_merged(db):
+    create_books()
+    resolver_querysets = [
+        Book.objects.prefetch_related('comments'),
+        Book.objects.prefetch_related('comments__book'),
+    ]
+
+    for resolver_queryset in resolver_querysets:
+        queryset = optimize_result(resolver_queryset, selection('title', 'comments', 'comments/text'))
+
+        with CaptureQueriesContext(connection) as queries:
+            rows = read(queryset, 'comments')
+
+        assert len(queries) == 2
+        assert rows[0]['comments'] == ['Comment 0.0', 'Comment 0.1']
+
+
+def test_prefetches_of_the_resolver_with_a_queryset_are_kept(db):
+    create_books()
+    first_comments = Prefetch('comments', queryset=Comment.objects.filter(text__endswith='.0'))
+
+    queryset = optimize_result(Book.objects.prefetch_related(first_comments),
+                               selection('title', 'comments', 'comments/text'))
+
+    assert read(queryset, 'comments')[0]['comments'] == ['Comment 0.0']
+
+
+def test_prune_columns_only_loads_the_requested_columns(db):
+    create_books()
+    queryset = optimize_result(Book.objects.all(), selection('title', 'author', 'author/name'), prune_columns=True)
+
+    book = queryset[0]
+
+    assert book.get_deferred_fields() == {'summary'}
+    assert book.author.get_deferred_fields() == {'bio'}
+
+
+def test_relations_joined_by_the_resolver_are_kept_when_pruning(db):
+    create_books()
+    queryset = optimize_result(Book.objects.select_related('author'), selection('id', 'title'), prune_columns=True)
+
+    with CaptureQueriesContext(connection) as queries:
+        book = queryset[0]
+        author = book.author
+
+    assert len(queries) == 1
+    assert book.get_deferred_fields() == {'summary'}
+    assert author.get_deferred_fields() == set()
+
+
+def test_models_on_nested_joins_are_loaded_whole_when_pruning(db):
+    create_books()
+    queryset = optimize_result(Comment.objects.select_related('book__author'), selection('text'), prune_columns=True)
+
+    with CaptureQueriesContext(connection) as queries:
+        comment = queryset[0]
+        book, author = comment.book, comment.book.author
+
+    assert len(queries) == 1
+    assert book.get_deferred_fields() == set()
+    assert author.get_deferred_fields() == set()
+
+
+def test_columns_are_not_pruned_with_extra_selects(db):
+    create_books()
+    queryset = optimize_result(Book.objects.extra(select={'shouted': 'UPPER(title)'}), selection('title'),
+                               prune_columns=True)
+
+    book = queryset[0]
+
+    assert book.shouted == 'BOOK 0'
+    assert book.get_deferred_fields() == set()
+
+
+def test_instances_get_their_relations_prefetched(db):
+    books = list(Book.objects.filter(pk__in=[book.pk for book in create_books()]))
+    optimize_result(books, selection('title', 'author', 'author/name', 'comments', 'comments/text'))
+
+    with CaptureQueriesContext(connection) as queries:
+        read(books, 'author', 'comments')
+
+    assert len(queries) == 0
+
+
+def test_values_and_combined_querysets_are_left_alone(db):
+    create_books()
+    values = Book.objects.values('title')
+    combined = Book.objects.filter(pk=1).union(Book.objects.filter(pk=2))
+
+    assert optimize_result(values, selection('title')) is values
+    assert optimize_result(combined, selection('title', 'author', 'author/name'), prune_columns=True) is combined
@@ -0,0 +1,62 @@
+import base64
+import gzip
+import json
+
+from django.http import HttpResponse
+
+from django_serverless import response as response_module
+from django_serverless.response import accepted_encodings, compress_response, to_apigateway_response
+
+BODY = json.dumps({'data': 'x' * 2000})
+
+
+def json_response():
+    return {'statusCode': 200, 'headers': {'Content-Type': 'application/json'}, 'body': BODY, 'isBase64Encoded': False}
+
+
+def test_accepted_encodings_leave_out_the_refused_ones():
+    assert accepted_encodings('gzip, deflate;q=0.5, br;q=0') == {'gzip', 'deflate'}
+    assert accepted_encodings(None) == set()
+
+
+def test_the_wildcard_stands_for_the_encodings_not_named():
+    assert accepted_encodings('*') == {'br', 'gzip'}
+    assert accepted_encodings('gzip;q=0, *') == {'br'}
+    assert accepted_encodings('br;q=0, gzip;q=0, *') == set()
+    assert accepted_encodings('identity, *;q=0') == {'identity'}
+
+
+def test_text_bodies_are_gzipped(monkeypatch):
+    monkeypatch.setattr(response_module, 'brotli', None)
+
+    response = compress_response(json_response(), 'gzip, deflate', 1024)
+
+    assert response['isBase64Encoded'] is True
+    assert response['headers']['Content-Encoding'] == 'gzip'
+    assert response['headers']['Vary'] == 'Accept-Encoding'
+    assert gzip.decompress(base64.b64decode(response['body'])).decode('utf-8') == BODY
+
+
+def test_small_or_refused_bodies_are_left_alone(monkeypatch):
+    monkeypatch.setattr(response_module, 'brotli', None)
+
+    assert compress_response(json_response(), 'gzip', len(BODY) + 1)['body'] == BODY
+    assert compress_response(json_response(), 'gzip', None)['body'] == BODY
+    assert compress_response(json_response(), 'identity', 1024)['body'] == BODY
+    assert compress_response(json_response(), 'gzip;q=0', 1024)['body'] == BODY
+    assert compress_response(json_response(), 'gzip;q=0, *', 1024)['body'] == BODY
+    assert compress_response(json_response(), '*', 1024)['headers']['Content-Encoding'] == 'gzip'
+
+
+def test_binary_responses_are_base64_encoded():
+    response = to_apigateway_response(HttpResponse(b'\x89PNG', content_type='image/png'))
+
+    assert response['isBase64Encoded'] is True
+    assert base64.b64decode(response['body']) == b'\x89PNG'
+
+
+def test_text_responses_are_passed_through():
+    response = to_apigateway_response(HttpResponse(BODY, content_type='application/json'))
+
+    assert response['isBase64Encoded'] is False
+    assert response['body'] == BODY
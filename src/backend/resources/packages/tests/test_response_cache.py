@@ -0,0 +1,87 @@
+import pytest
+
+from django_serverless import response_cache as response_cache_module
+from django_serverless.response_cache import MISSING, ResponseCache, identity_of, response_cache_key
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(response_cache_module, 'monotonic', clock)
+    return clock
+
+
+class Request:
+    def __init__(self, headers):
+        self.headers = headers
+
+
+def test_entries_expire_after_the_ttl(clock):
+    cache = ResponseCache(ttl=10, max_bytes=1024)
+    cache.set('key', {'id': 1})
+
+    clock.now = 9
+    assert cache.get('key') == {'id': 1}
+
+    clock.now = 10
+    assert cache.get('key') is MISSING
+    assert cache.stats()['expirations'] == 1
+
+
+def test_least_recently_used_entries_are_evicted_over_the_size(clock):
+    cache = ResponseCache(ttl=10, max_bytes=30)
+    cache.set('a', {'value': 'a'})
+    cache.set('b', {'value': 'b'})
+    cache.get('a')
+    cache.set('c', {'value': 'c'})
+
+    assert cache.get('b') is MISSING
+    assert cache.get('a') == {'value': 'a'}
+    assert cache.stats()['evictions'] == 1
+
+
+def test_entries_larger_than_the_cache_are_not_stored(clock):
+    cache = ResponseCache(ttl=10, max_bytes=8)
+    cache.set('key', {'value': 'too large'})
+
+    assert cache.get('key') is MISSING
+
+
+def test_hits_are_copies(clock):
+    cache = ResponseCache(ttl=10, max_bytes=1024)
+    cache.set('key', {'tags': ['a']})
+
+    cache.get('key')['tags'].append('b')
+
+    assert cache.get('key') == {'tags': ['a']}
+
+
+def test_identities():
+    request = Request({'authorization': 'token'})
+
+    assert identity_of(request, None) is None
+    assert identity_of(request, 'header:Authorization') not in (None, 'token')
+    assert identity_of(Request({}), 'header:Authorization') is None
+
+    with pytest.raises(ValueError):
+        identity_of(request, 'cookie')
+
+
+def test_keys_depend_on_the_arguments_selection_and_identity():
+    event = {'info': {'parentTypeName': 'Query', 'fieldName': 'book'}, 'arguments': {'id': 1}}
+    other_event = {**event, 'arguments': {'id': 2}}
+
+    key = response_cache_key(event, ('id',), None)
+
+    assert key == response_cache_key(event, ('id',), None)
+    assert key != response_cache_key(other_event, ('id',), None)
+    assert key != response_cache_key(event, ('id', 'title'), None)
+    assert key != response_cache_key(event, ('id',), 'user')
@@ -0,0 +1,101 @@
+import json
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta, timezone
+from decimal import Decimal
+from enum import Enum
+from uuid import UUID
+
+import pytest
+
+from django_serverless import serializers
+from django_serverless.serializers import dumps, register_encoder, serialize_value
+
+
+class Color(Enum):
+    RED = 'red'
+
+
+@dataclass
+class Point:
+    x: int
+    at: date
+
+
+@pytest.fixture(params=['orjson', 'json'])
+def backend(request, monkeypatch):
+    if request.param == 'orjson':
+        pytest.importorskip('orjson')
+    else:
+        monkeypatch.setattr(serializers, 'orjson', None)
+
+    return request.param
+
+
+def test_aws_scalars():
+    assert serialize_value(datetime(2020, 1, 2, 3, 4, 5)) == '2020-01-02T03:04:05Z'
+    assert serialize_value(datetime(2020, 1, 2, 3, 4, 5, 6000, tzinfo=timezone(timedelta(hours=2)))) == \
+        '2020-01-02T01:04:05.006Z'
+    assert serialize_value(date(2020, 1, 2)) == '2020-01-02'
+    assert serialize_value(time(3, 4, 5)) == '03:04:05'
+    assert serialize_value(Decimal('1.5')) == 1.5
+    assert serialize_value(Color.RED) == 'red'
+
+
+def test_nested_values():
+    value = {'ids': (UUID(int=1),), 'tags': {'a'}, 'at': [date(2020, 1, 2)]}
+
+    assert serialize_value(value) == {'ids': [str(UUID(int=1))], 'tags': ['a'], 'at': ['2020-01-02']}
+
+
+def test_registered_encoders_apply_to_subclasses():
+    class Money(Decimal):
+        pass
+
+    register_encoder(Decimal, str)
+    try:
+        assert serialize_value(Money('1.50')) == '1.50'
+    finally:
+        register_encoder(Decimal, serializers.serialize_decimal)
+
+
+def test_dumps(backend):
+    value = {'id': UUID(int=1), 'at': datetime(2020, 1, 2, 3, 4, 5), 'price': Decimal('1.5'), 'color': Color.RED}
+
+    assert json.loads(dumps(value)) == {
+        'id': str(UUID(int=1)),
+        'at': '2020-01-02T03:04:05Z',
+        'price': 1.5,
+        'color': 'red',
+    }
+
+
+def test_dumps_rejects_unknown_types(backend):
+    with pytest.raises(TypeError):
+        dumps({'value': object()})
+
+
+def test_dumps_non_str_keys(backend):
+    value = {
+        1: 'int',
+        None: 'none',
+        UUID(int=1): 'uuid',
+        date(2020, 1, 2): 'date',
+        datetime(2020, 1, 2, 3, 4, 5, tzinfo=timezone.utc): 'datetime',
+        Color.RED: 'enum',
+        'nested': [{2: (Point(1, date(2020, 1, 2)),)}],
+    }
+
+    assert json.loads(dumps(value)) == {
+        '1': 'int',
+        'null': 'none',
+        str(UUID(int=1)): 'uuid',
+        '2020-01-02': 'date',
+        '2020-01-02T03:04:05+00:00': 'datetime',
+        'red': 'enum',
+        'nested': [{'2': [{'x': 1, 'at': '2020-01-02'}]}],
+    }
+
+
+def test_dumps_rejects_unknown_keys(backend):
+    with pytest.raises(TypeError):
+        dumps({Decimal('1.5'): 'decimal'})
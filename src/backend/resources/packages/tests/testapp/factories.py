@@ -0,0 +1,13 @@
+from testapp.models import Author, Book, Comment
+
+
+def create_books(count: int = 3, comments_per_book: int = 2):
+    author = Author.objects.create(name='Ursula', bio='Earthsea')
+    books = []
+
+    for i in range(count):
+        book = Book.objects.create(title=f'Book {i}', summary=f'Summary {i}', author=author)
+        Comment.objects.bulk_create(Comment(book=book, text=f'Comment {i}.{j}') for j in range(comments_per_book))
+        books.append(book)
+
+    return books
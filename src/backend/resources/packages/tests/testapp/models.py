@@ -0,0 +1,17 @@
+from django.db import models
+
+
+class Author(models.Model):
+    name = models.CharField(max_length=100)
+    bio = models.TextField(default='')
+
+
+class Book(models.Model):
+    title = models.CharField(max_length=100)
+    summary = models.TextField(default='')
+    author = models.ForeignKey(Author, on_delete=models.CASCADE, related_name='books')
+
+
+class Comment(models.Model):
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='comments')
+    text = models.TextField()
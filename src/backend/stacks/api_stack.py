@@ -10,6 +10,18 @@ from src.backend import with_env
 from src.backend.dataclasses import ResolverConfig
 
 GENERATE_SCHEMA = True
+MINIMUM_COMPRESSION_SIZE = 1024  # Bytes from which API Gateway compresses the responses it didn't get compressed
+
+# Bodies API Gateway passes base64 encoded to the resolvers, and decodes from the resolvers' base64 encoded responses
+BINARY_MEDIA_TYPES = [
+    'multipart/form-data',  # Uploads, see `django_serverless.multipart`
+    'application/octet-stream',
+    'application/pdf',
+    'image/*',
+]
+# Types of the responses compressed by the resolvers (`ResolverConfig.compression_min_size`), which reach the client
+# only when binary. Request bodies of these types get base64 encoded as well
+COMPRESSED_MEDIA_TYPES = ['application/json']
 
 
 class ApiStack(core.Construct):
@@ -34,16 +46,21 @@ class ApiStack(core.Construct):
 
         self._create_graphql_api()
         self.rest_resources = {}
-        self._create_rest_api()
+        self._create_rest_api(resolvers_config)
 
         self._create_resolvers(resolvers_config)
 
-    def _create_rest_api(self):
+    def _create_rest_api(self, resolvers_config: List[ResolverConfig]):
+        compresses_responses = any(
+            resolver.is_rest and resolver.compression_min_size is not None for resolver in resolvers_config
+        )
+
         self.rest_api = apigateway.RestApi(
             self, with_env('rest-api'),
             rest_api_name=with_env('rest-api'),
             api_key_source_type=apigateway.ApiKeySourceType.HEADER,
-            binary_media_types=['multipart/form-data'],
+            binary_media_types=BINARY_MEDIA_TYPES + (COMPRESSED_MEDIA_TYPES if compresses_responses else []),
+            minimum_compression_size=MINIMUM_COMPRESSION_SIZE,
         )
 
     def _create_graphql_api(self):
@@ -66,7 +83,8 @@ class ApiStack(core.Construct):
     def _create_resolvers(self, resolvers_config):
         # TODO: create a service role for all data sources
         for resolver in resolvers_config:
-            if resolver.operation in ['Query', 'Mutation']:
+            if not resolver.is_rest:
+                # Either a 'Query' | 'Mutation' field or a nested field of the `operation` type
                 data_source_name = with_env(f'{resolver.name}-source')
                 data_source = appsync.LambdaDataSource(
                     self, data_source_name,
@@ -74,13 +92,16 @@ class ApiStack(core.Construct):
                     lambda_function=resolver.function,
                     name=data_source_name.replace('-', '_')
                 )
-                appsync.Resolver(
+                graphql_resolver = appsync.Resolver(
                     self, with_env(f'{resolver.name}-resolver'),
                     api=self.graphql_api,
                     data_source=data_source,
                     field_name=resolver.name,
                     type_name=resolver.operation,
                 )
+                if resolver.batch_size is not None:
+                    # Direct Lambda resolvers with a max batch size get invoked with a list of events (BatchInvoke)
+                    graphql_resolver.node.default_child.add_property_override('MaxBatchSize', resolver.batch_size)
             else:
                 full_path_resources = resolver.rest_path.split('/')
                 resource, resource_path = self._get_rest_resource(resolver)
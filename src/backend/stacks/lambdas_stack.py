@@ -1,10 +1,9 @@
+import hashlib
 import importlib
-import importlib.machinery
-import importlib.util
 import os
 import shutil
 import subprocess
-from typing import List
+from typing import Dict, List
 
 from aws_cdk import (core,
                      aws_lambda as lambda_,
@@ -12,12 +11,16 @@ from aws_cdk import (core,
                      aws_events,
                      aws_events_targets, )
 
-from src.backend import with_env, env_name, is_production_env
+from src.backend import with_env, env_name, is_production_env, is_debug_env
 from src.backend.dataclasses import LayerConfig, LayerAppConfig, ResolverConfig
-from src.backend.resources.handler_append import generate_append
-from src.backend.resources.handler_prepend import generate_prepend
+from src.backend.resources.handler import generate_handler
 
 INSTALL_REQUIREMENTS = False  # Set this to True whenever you update your App's requirements.txt, keep False to cache
+LOG_SAMPLE_RATE = 0.01  # Share of invocations that log at DEBUG level in non debug environments
+WARM_BUDGET = 50  # Most warm invocations per warmer run, across all the resolvers
+WARM_SCHEDULE = 'cron(0/3 8-22 * * ? *)'  # Default `ResolverConfig.warm_schedule`, business hours
+ADAPTIVE_WARM_SCHEDULE = 'rate(3 minutes)'  # Default of adaptive resolvers, they decide when it's worth warming
+WARM_MIN_ACTIVITY = 0.25  # Adaptive warming warms in the hours of the day with traffic on at least this share of days
 
 
 class LambdasStack(core.Construct):
@@ -59,15 +62,7 @@ class LambdasStack(core.Construct):
         if is_production_env():
             print('Is production ENV, adding warmer function')
             lambda_warmer = self._build_warmer_function(functions_config)
-
-            every_3_minutes = ','.join(map(str, list(range(0, 60, 3))))
-            business_hours = ','.join(map(str, list(range(8, 23))))
-            event = aws_events.Rule(self, with_env('lambda_warmer_rule'),
-                                    schedule=aws_events.Schedule.cron(
-                                        hour=business_hours,
-                                        minute=every_3_minutes)
-                                    )
-            event.add_target(aws_events_targets.LambdaFunction(lambda_warmer))
+            self._build_warmer_rules(lambda_warmer, functions_config)
 
     def _build_warmer_function(self, functions_config: List[ResolverConfig]):
         lambda_name = 'lambda_warmer'
@@ -77,8 +72,12 @@ class LambdasStack(core.Construct):
 
         # Last stable, keys are numbers
         warmer_environment = {
-            f'f{i}': config.function.function_arn
-            for i, config in enumerate(functions_config)
+            'env_name': env_name(),
+            'budget': str(WARM_BUDGET),
+            'min_activity': str(WARM_MIN_ACTIVITY),
+            **{f'f{i}': config.function.function_arn for i, config in enumerate(functions_config)},
+            **{f'c{i}': str(config.warm_concurrency) for i, config in enumerate(functions_config)},
+            **{f'p{i}': config.warm_policy for i, config in enumerate(functions_config)},
         }
 
         return lambda_.Function(self, with_env(lambda_name),
@@ -93,6 +92,30 @@ class LambdasStack(core.Construct):
                                 environment=warmer_environment
                                 )
 
+    def _build_warmer_rules(self, lambda_warmer: lambda_.Function, functions_config: List[ResolverConfig]):
+        """One rule per distinct `ResolverConfig.warm_schedule`, its event lists the functions the warmer warms then."""
+        schedules: Dict[str, List[str]] = {}
+        for config in functions_config:
+            if config.warm_concurrency <= 0:
+                continue
+
+            schedule = config.warm_schedule
+            if schedule is None:
+                schedule = ADAPTIVE_WARM_SCHEDULE if config.warm_policy == 'adaptive' else WARM_SCHEDULE
+
+            schedules.setdefault(schedule, []).append(with_env(config.name))
+
+        for schedule, function_names in schedules.items():
+            # Keyed by the schedule, which is unique per rule, so rules keep their ids when resolvers are added, removed
+            # or rescheduled, and a change of targets updates the rule in place
+            schedule_key = hashlib.sha1(schedule.encode('utf-8')).hexdigest()[:10]
+            rule = aws_events.Rule(self, with_env(f'lambda_warmer_rule_{schedule_key}'),
+                                   schedule=aws_events.Schedule.expression(schedule))
+            rule.add_target(aws_events_targets.LambdaFunction(
+                lambda_warmer,
+                event=aws_events.RuleTargetInput.from_object({'targets': function_names}),
+            ))
+
     def _build_function(self, config: ResolverConfig):
         function = lambda_.Function(self, with_env(f'resolver-{config.name}'),
                                     runtime=lambda_.Runtime.PYTHON_3_8,
@@ -103,6 +126,7 @@ class LambdasStack(core.Construct):
                                     timeout=core.Duration.seconds(15),
                                     role=self.lambdas_role,
                                     memory_size=192,
+                                    environment=self._build_function_environment(),
                                     )
 
         alias = lambda_.Alias(self, with_env(f'alias-{config.name}'),
@@ -114,6 +138,13 @@ class LambdasStack(core.Construct):
                               )
         config.function = alias
 
+    @staticmethod
+    def _build_function_environment():
+        return {
+            'DJANGO_SERVERLESS_LOG_LEVEL': 'DEBUG' if is_debug_env() else 'INFO',
+            'DJANGO_SERVERLESS_LOG_SAMPLE_RATE': '0' if is_debug_env() else str(LOG_SAMPLE_RATE),
+        }
+
     def _prepare_lambda_directory(self, config: ResolverConfig):
         self.lambda_dir = os.path.join(self.lambdas_dir, config.name)
         os.makedirs(self.lambda_dir, exist_ok=True)
@@ -121,20 +152,10 @@ class LambdasStack(core.Construct):
     def _create_lambda_code_from_source(self, config: ResolverConfig):
         self._prepare_lambda_directory(config)
 
-        source_path = importlib.util.find_spec(config.path).origin
-        if not os.path.exists(source_path):
-            raise ValueError(
-                f'Handler path {source_path} doesnt exists! Setup was probably done incorrectly and the deploy app cant find the code!')
-
         handler_path = os.path.join(self.lambda_dir, self.handler_file)
 
         with open(handler_path, 'wb') as handler_file:
-            handler_file.write(generate_prepend(config))
-
-            with open(source_path, 'rb') as source_file:
-                handler_file.write(source_file.read())
-
-            handler_file.write(generate_append(config))
+            handler_file.write(generate_handler(config))
 
     def _build_lambda_role(self):
         # TODO: make the IAM roles configurable per resolver